@@ -1,47 +1,134 @@
 ﻿const int motorPin = 9;     //상수 선언 : 모터 핀 번호
 const int ledPin = 10;     //상수 선언 : LED 핀번호
 
+// 프레임 : [0xA5][명령][값 하위][값 상위][순번][CRC-8]
+// 응답은 같은 형식으로 명령에 0x80 을 더하고 현재 값을 담아 보냄, 알 수 없는 명령은 0xFF 로 응답
+// LED / 모터 명령은 마지막으로 적용한 순번보다 이전 순번이면 적용하지 않고 현재 값만 응답 (재전송 순서 뒤바뀜 방지)
+const byte FRAME_START = 0xA5;
+const byte FRAME_SIZE = 6;
+
+const byte CMD_LED = 0x01;
+const byte CMD_MOTOR = 0x02;
+const byte CMD_GET_MOTOR = 0x03;
+const byte CMD_GET_LED = 0x04;
+const byte CMD_PING = 0x05;   //호스트가 연결할 때 보냄, 순번 기록 초기화
+const byte ACK = 0x80;
+const byte CMD_ERROR = 0xFF;
+
+byte frame[FRAME_SIZE];
+byte received = 0;
+
+int motorSpeed = 0;
+bool ledOn = false;
+
+const byte SLOT_LED = 0;
+const byte SLOT_MOTOR = 1;
+byte lastSeq[2];
+bool hasSeq[2] = {false, false};
+
 void setup() {
 	pinMode(motorPin, OUTPUT);//모터 핀 출력 생성
 	pinMode(ledPin, OUTPUT);//LED 핀 출력 생성
-	Serial.begin(9600);
+	Serial.begin(115200);
 }
 
 void loop() {
-	spiningMotor();//모터 출력 FUNCTION
-	led();//LED 출력 FUNCTION
+	//수신된 바이트만 처리하고 바로 돌아감 (parseInt 처럼 기다리지 않음)
+	while (Serial.available() > 0) {
+		receive(Serial.read());
+	}
 }
 
-void led()
+byte crc8(const byte *data, byte len)
 {
-	int chk;//CHECK 값
-	while (Serial.available() == 0) {}//시리얼 안받으면 씹힘
-	chk = Serial.parseInt();//0~1로 CHEKING
-	if (chk == true)
-	{
-		digitalWrite(ledPin, HIGH);//LED 출력
-		Serial.println("LED : ON");
+	byte crc = 0;
+	for (byte i = 0; i < len; i++) {
+		crc ^= data[i];
+		for (byte bit = 0; bit < 8; bit++) {
+			crc = (crc & 0x80) ? (byte)((crc << 1) ^ 0x07) : (byte)(crc << 1);
+		}
 	}
-	else
-	{
-		digitalWrite(ledPin, LOW);//LED 끔
-		Serial.println("LED : OFF");
+	return crc;
+}
+
+void receive(byte b)
+{
+	if (received == 0 && b != FRAME_START) {
+		return;//시작 바이트가 나올 때까지 버림
 	}
 
+	frame[received++] = b;
+	if (received < FRAME_SIZE) {
+		return;
+	}
+	received = 0;
 
+	if (crc8(frame + 1, FRAME_SIZE - 2) != frame[FRAME_SIZE - 1]) {
+		return;//체크섬 오류, 호스트가 재전송
+	}
 
+	execute(frame[1], frame[2] | (frame[3] << 8), frame[4]);
 }
-void spiningMotor()
+
+bool isNewer(byte slot, byte seq)
 {
-	int speed;//속도 값
-	while (Serial.available() == 0) {}//시리얼 안받으면 씹힘
-	speed = Serial.parseInt();//속도 입력
-	speed = constrain(speed, 0, 255);     //속도를 PWM 출력 값 범위로 고정
+	//순번은 8 비트로 돌아가므로 128 이내로 앞선 순번만 새 명령으로 봄, 같은 순번은 재전송
+	byte diff = seq - lastSeq[slot];
+	if (hasSeq[slot] && (diff == 0 || diff >= 128)) {
+		return false;
+	}
+	lastSeq[slot] = seq;
+	hasSeq[slot] = true;
+	return true;
+}
 
-	analogWrite(motorPin, speed);         //speed만큼으로 모터 돌리기
+void execute(byte command, int value, byte seq)
+{
+	switch (command) {
+	case CMD_LED:
+		if (isNewer(SLOT_LED, seq)) {
+			ledOn = value != 0;
+			digitalWrite(ledPin, ledOn ? HIGH : LOW);//LED 출력
+		}
+		reply(command, ledOn, seq);
+		break;
+	case CMD_MOTOR:
+		if (isNewer(SLOT_MOTOR, seq)) {
+			motorSpeed = constrain(value, 0, 255);     //속도를 PWM 출력 값 범위로 고정
+			analogWrite(motorPin, motorSpeed);         //speed만큼으로 모터 돌리기
+		}
+		reply(command, motorSpeed, seq);
+		break;
+	case CMD_GET_MOTOR:
+		reply(command, motorSpeed, seq);
+		break;
+	case CMD_GET_LED:
+		reply(command, ledOn, seq);
+		break;
+	case CMD_PING:
+		hasSeq[SLOT_LED] = false;
+		hasSeq[SLOT_MOTOR] = false;
+		reply(command, 0, seq);
+		break;
+	default:
+		send(CMD_ERROR, command, seq);
+		break;
+	}
+}
 
-	//speed : 값을 출력
-	Serial.print("speed : ");
-	Serial.println(speed);
+void reply(byte command, int value, byte seq)
+{
+	send(command | ACK, value, seq);
+}
 
+void send(byte response, int value, byte seq)
+{
+	byte out[FRAME_SIZE];
+	out[0] = FRAME_START;
+	out[1] = response;
+	out[2] = value & 0xFF;
+	out[3] = (value >> 8) & 0xFF;
+	out[4] = seq;
+	out[5] = crc8(out + 1, FRAME_SIZE - 2);
+	Serial.write(out, FRAME_SIZE);
 }
\ No newline at end of file
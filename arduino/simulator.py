@@ -0,0 +1,137 @@
+import argparse
+import os
+import random
+import select
+import sys
+import time
+import tty
+
+# arduino.ino 의 동작을 가상 터미널(pty) 위에서 흉내냄
+FRAME_START = 0xA5
+FRAME_SIZE = 6
+
+CMD_LED = 0x01
+CMD_MOTOR = 0x02
+CMD_GET_MOTOR = 0x03
+CMD_GET_LED = 0x04
+CMD_PING = 0x05
+ACK = 0x80
+CMD_ERROR = 0xFF
+
+
+def crc8(data):
+    crc = 0
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+class Sketch:
+    def __init__(self, loss: float = 0, latency: float = 0):
+        self.loss = loss
+        self.latency = latency
+        self.frame = bytearray()
+        self.motor_speed = 0
+        self.led_on = False
+        self.last_seq = dict()
+        self.log = list()
+
+    def receive(self, b: int):
+        if not self.frame and b != FRAME_START:
+            return None
+
+        self.frame.append(b)
+        if len(self.frame) < FRAME_SIZE:
+            return None
+        frame, self.frame = self.frame, bytearray()
+
+        if crc8(frame[1:FRAME_SIZE - 1]) != frame[FRAME_SIZE - 1]:
+            return None
+        if self.loss and random.random() < self.loss:
+            return None
+
+        return self.execute(frame[1], frame[2] | frame[3] << 8, frame[4])
+
+    def is_newer(self, command: int, seq: int):
+        # 스케치와 같이 8 비트 순번에서 128 이내로 앞선 순번만 적용
+        last = self.last_seq.get(command)
+        if last is not None and ((seq - last) & 0xFF == 0 or (seq - last) & 0xFF >= 128):
+            return False
+        self.last_seq[command] = seq
+        return True
+
+    def execute(self, command: int, value: int, seq: int):
+        self.log.append((time.monotonic(), command, value, seq))
+        if command == CMD_LED:
+            if self.is_newer(command, seq):
+                self.led_on = value != 0
+            return self.reply(command, int(self.led_on), seq)
+        elif command == CMD_MOTOR:
+            if self.is_newer(command, seq):
+                self.motor_speed = max(0, min(value, 255))
+            return self.reply(command, self.motor_speed, seq)
+        elif command == CMD_GET_MOTOR:
+            return self.reply(command, self.motor_speed, seq)
+        elif command == CMD_GET_LED:
+            return self.reply(command, int(self.led_on), seq)
+        elif command == CMD_PING:
+            self.last_seq.clear()
+            return self.reply(command, 0, seq)
+        return self.send(CMD_ERROR, command, seq)
+
+    @classmethod
+    def reply(cls, command: int, value: int, seq: int):
+        return cls.send(command | ACK, value, seq)
+
+    @staticmethod
+    def send(response: int, value: int, seq: int):
+        out = bytes((response, value & 0xFF, (value >> 8) & 0xFF, seq))
+        return bytes((FRAME_START,)) + out + bytes((crc8(out),))
+
+
+def open_pty():
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+def serve(master: int, sketch: Sketch, stop=None):
+    while stop is None or not stop.is_set():
+        ready, _, _ = select.select([master], [], [], 0.1)
+        if not ready:
+            continue
+        try:
+            data = os.read(master, 256)
+        except OSError:
+            return
+        for b in data:
+            out = sketch.receive(b)
+            if out:
+                if sketch.latency:
+                    time.sleep(sketch.latency)
+                os.write(master, out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial simulator of arduino.ino on a pseudo-terminal")
+    parser.add_argument("--loss", type=float, default=0, help="probability of dropping a received frame")
+    parser.add_argument("--latency", type=float, default=0, help="seconds to wait before each reply")
+    args = parser.parse_args()
+
+    master, slave, path = open_pty()
+    print(path, flush=True)
+    try:
+        serve(master, Sketch(args.loss, args.latency))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master)
+        os.close(slave)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import fnmatch
+import os
+import sys
+
+from .cases import BENCHMARKS
+from .harness import compare, load_baseline, measure, save_baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks", description="sfsb hot path benchmarks")
+parser.add_argument("-k", "--filter", default="*", help="glob pattern of benchmark names")
+parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+parser.add_argument("--save", action="store_true", help="store results as the new baseline")
+parser.add_argument("--threshold", type=float, default=0.2, help="allowed ops/sec drop ratio (default 0.2)")
+parser.add_argument("--scale", type=float, default=1.0, help="multiply iteration counts")
+args = parser.parse_args()
+
+results = dict()
+print(f"{'benchmark':<40} {'ops/sec':>12} {'p50':>9} {'p90':>9} {'p99':>9} {'peak alloc':>11}")
+for bench in BENCHMARKS:
+    if not fnmatch.fnmatch(bench.name, args.filter):
+        continue
+    result = results[bench.name] = measure(bench, args.scale)
+    print(f"{bench.name:<40} {result['ops_per_sec']:>12,.0f} {result['p50_ns'] / 1000:>7.1f}us "
+          f"{result['p90_ns'] / 1000:>7.1f}us {result['p99_ns'] / 1000:>7.1f}us {result['alloc_peak_bytes']:>10,}B")
+
+if args.save:
+    save_baseline(args.baseline, results)
+    print(f"baseline saved to {args.baseline}")
+    sys.exit(0)
+
+baseline = load_baseline(args.baseline)
+if baseline is None:
+    print(f"no baseline at {args.baseline}, run with --save to create one")
+    sys.exit(0)
+
+regressions = compare(results, baseline, args.threshold)
+for name, ratio in regressions:
+    print(f"REGRESSION {name}: {ratio:.0%} of baseline ops/sec")
+sys.exit(1 if regressions else 0)
@@ -0,0 +1,185 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import tempfile
+
+import cortex
+from cortex.decoder import FrameDecoder
+from mock_cortex.server import STREAM_COLS, Connection
+from sfsb import callbacks, features, listeners, rules
+from sfsb.utils.config import YAMLConfiguration
+
+from .harness import Benchmark
+
+FRAMES_PER_RUN = 1000
+
+
+def subscribe_response(*streams):
+    return {"success": [{"streamName": s, "cols": STREAM_COLS[s], "sid": "bench"} for s in streams], "failure": []}
+
+
+def frame(stream):
+    return {stream: getattr(Connection, f"sample_{stream}")(0), "sid": "bench", "time": 1600000000.0}
+
+
+def subscribed(listener, *streams):
+    listener.handle(cortex.ID.SUBSCRIPTION.SUBSCRIBE, subscribe_response(*streams), True)
+    return listener
+
+
+class MemoryConnection:
+    def __init__(self, frames):
+        self.frames = iter(frames)
+
+    async def recv(self):
+        for recv in self.frames:
+            return recv
+        raise cortex.api.websockets.ConnectionClosedOK(None, None)
+
+    async def send(self, data):
+        pass
+
+    async def close(self):
+        pass
+
+
+def setup_decode():
+    decoder = FrameDecoder()
+    raw = json.dumps(frame("pow"))
+    return lambda: decoder.decode(raw)
+
+
+def setup_recv_task():
+    raw = [json.dumps(frame("pow")) for _ in range(FRAMES_PER_RUN)]
+    loop = asyncio.new_event_loop()
+
+    async def main():
+        pass
+
+    def run():
+        asyncio.set_event_loop(loop)
+        wrapper = cortex.Wrapper("bench", "bench", main, connect=lambda url: _connection(raw),
+                                 reconnect=False)
+        wrapper.register_listener(subscribed(listeners.PowerListener(lambda sample: None), "pow"))
+        loop.run_until_complete(wrapper.start())
+
+    return run
+
+
+async def _connection(frames):
+    return MemoryConnection(frames)
+
+
+def setup_listener_routing():
+    listener = subscribed(listeners.PowerListener(lambda sample: None), "pow")
+    data = frame("pow")
+    return lambda: listener.handle("pow", data, True)
+
+
+def setup_stream_buffer(stream):
+    def setup():
+        listener = subscribed(getattr(listeners, {"pow": "PowerListener", "met": "MetricListener",
+                                                  "mot": "MotionListener"}[stream])(lambda sample: None), stream)
+        data = frame(stream)
+        return lambda: listener.handle_sample(data)
+
+    return setup
+
+
+def setup_pow_handler():
+    listener = subscribed(listeners.PowerListener(callbacks.pow_handler, features=callbacks.FEATURES), "pow")
+    data = [frame("pow") for _ in range(64)]
+    for d in data:
+        d["pow"] = [random.uniform(0.1, 30) for _ in d["pow"]]
+    samples = itertools.cycle(data)
+    return lambda: listener.handle_sample(next(samples))
+
+
+def setup_features(batch: int = None):
+    def setup():
+        bands = ["theta", "alpha", "betaL", "betaH", "gamma"]
+        specs = {f"{a}/{b}": {"ratio": [a, b]} for a in bands for b in bands if a != b}
+        specs.update({f"mean_{band}": {"mean": band} for band in bands})
+        specs.update({f"asym_{band}": {"asymmetry": band, "pairs": [["AF3", "AF4"], ["F7", "F8"]]} for band in bands})
+        listener = subscribed(listeners.PowerListener(lambda sample: None), "pow")
+        for d in [frame("pow") for _ in range(listener.size)]:
+            listener.buffer.append(d["time"], [random.uniform(0.1, 30) for _ in d["pow"]])
+        extractor = features.FeatureSet(specs).compile(listener.buffer.index)
+        rows = listener.buffer.window(batch) if batch else listener.buffer.window(1)[0]
+        return lambda: extractor(rows)
+
+    return setup
+
+
+def setup_eeg_power(method):
+    def setup():
+        listener = subscribed(listeners.EEGPowerListener(lambda sample: None, method=method), "eeg")
+        data = [frame("eeg") for _ in range(256)]
+        for i, d in enumerate(data):
+            d["eeg"] = Connection.sample_eeg(i)
+        samples = itertools.cycle(data)
+        return lambda: listener.handle_sample(next(samples))
+
+    return setup
+
+
+def setup_met_handler():
+    listener = subscribed(listeners.MetricListener(callbacks.met_handler), "met")
+    data = frame("met")
+    return lambda: listener.handle_sample(data)
+
+
+def setup_rules(count: int):
+    def setup():
+        bands = ["theta", "alpha", "betaL", "betaH", "gamma"]
+        specs = dict()
+        for i in range(count):
+            a, b = bands[i % 5], bands[(i + 1 + i // 5) % 5]
+            # 앱과 같이 callbacks.FEATURES 를 넘기므로 원시 열과 특징을 섞어서 씀
+            expr = f"AF3_{a} / (AF4_{b} + F7_{a})" if i % 2 else f"eye_flicker * AF3_{a} / F7_{b}"
+            specs[f"rule{i}"] = {"stream": "pow", "expr": expr, "window": 10, "above": 1.0, "hysteresis": 0.1,
+                                 "vote": [6, 10]}
+        engine = rules.RuleEngine(specs)
+        listener = subscribed(listeners.PowerListener(lambda sample: engine.handle("pow", sample),
+                                                      features=callbacks.FEATURES), "pow")
+        data = [frame("pow") for _ in range(64)]
+        for d in data:
+            d["pow"] = [random.uniform(0.1, 30) for _ in d["pow"]]
+        samples = itertools.cycle(data)
+        listener.handle_sample(data[0])
+        disabled = engine.groups[("pow", None)].disabled
+        if disabled:
+            raise RuntimeError(f"rules disabled with the app's feature wiring: {', '.join(disabled)}")
+        return lambda: listener.handle_sample(next(samples))
+
+    return setup
+
+
+def setup_config_get():
+    fd, path = tempfile.mkstemp(suffix=".yml")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write("Emotiv:\n  Client_ID: id\n  Client_Secret: secret\nRaspberry:\n  Server_URL: http://pi\n")
+    config = YAMLConfiguration(path)
+    config.load()
+    os.remove(path)
+    return lambda: config.get("Raspberry.Server_URL")
+
+
+BENCHMARKS = [
+    Benchmark("decoder.decode[pow]", setup_decode, 50000),
+    Benchmark(f"wrapper.recv_task[{FRAMES_PER_RUN} pow frames]", setup_recv_task, 20),
+    Benchmark("listener.handle[pow]", setup_listener_routing, 50000),
+    Benchmark("stream_buffer[pow]", setup_stream_buffer("pow"), 50000),
+    Benchmark("stream_buffer[met]", setup_stream_buffer("met"), 50000),
+    Benchmark("stream_buffer[mot]", setup_stream_buffer("mot"), 50000),
+    Benchmark("callbacks.pow_handler", setup_pow_handler, 50000),
+    Benchmark("features[30 x 1 sample]", setup_features(), 50000),
+    Benchmark("features[30 x 256 samples]", setup_features(256), 5000),
+    Benchmark("eeg_power[welch, per sample]", setup_eeg_power("welch"), 20000),
+    Benchmark("eeg_power[sdft, per sample]", setup_eeg_power("sdft"), 20000),
+    Benchmark("callbacks.met_handler", setup_met_handler, 20000),
+    Benchmark("rules[32 pow rules]", setup_rules(32), 10000),
+    Benchmark("config.get", setup_config_get, 100000)
+]
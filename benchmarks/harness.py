@@ -0,0 +1,99 @@
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+
+class Benchmark:
+    def __init__(self, name, setup, number: int = 20000):
+        self.name = name
+        self.setup = setup
+        self.number = number
+
+
+def measure(bench: Benchmark, scale: float = 1.0):
+    func = bench.setup()
+    number = max(int(bench.number * scale), 100)
+
+    for _ in range(min(number, 1000)):
+        func()
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+
+        samples = list()
+        clock = time.perf_counter_ns
+        for _ in range(min(number, 10000)):
+            t = clock()
+            func()
+            samples.append(clock() - t)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    calls = min(number, 1000)
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(calls):
+            func()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "ops_per_sec": number / elapsed,
+        "p50_ns": percentile(samples, 50),
+        "p90_ns": percentile(samples, 90),
+        "p99_ns": percentile(samples, 99),
+        "max_ns": samples[-1],
+        "alloc_peak_bytes": peak - before,
+        "alloc_retained_bytes_per_call": (after - before) / calls
+    }
+
+
+def percentile(samples, p):
+    index = min(int(len(samples) * p / 100), len(samples) - 1)
+    return samples[index]
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, threshold: float):
+    regressions = list()
+    if not baseline:
+        return regressions
+
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["ops_per_sec"] / base["ops_per_sec"]
+        if ratio < 1 - threshold:
+            regressions.append((name, ratio))
+    return regressions
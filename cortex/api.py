@@ -1,10 +1,22 @@
 import asyncio
+import contextlib
+import contextvars
+import itertools
 import json
 import logging
-from typing import List
+import os
+import random
+import time
+import types
+from typing import Dict, List
 
 import websockets
 
+from . import decoder as frame_decoder
+from .dispatch import DROP_OLDEST, StreamQueue
+from .metrics import Metrics
+from .recorder import FrameRecorder
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,6 +37,51 @@ class CortexError(CortexException):
         return f"{self.error_code}: {self.msg}"
 
 
+class Batch:
+    def __init__(self):
+        self.requests = list()
+        self.payloads = list()
+        self.results = list()
+        self.flushed = False
+        # 요청이 페이로드를 큐에 넣을 때마다 set
+        self.queued = asyncio.Event()
+
+    def add(self, request):
+        self.requests.append(request)
+        return len(self.requests) - 1
+
+    def queue(self, payload: dict):
+        self.payloads.append(payload)
+        self.queued.set()
+
+
+def load_token(path: str):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"could not read cortex token from {path}: {e!r}")
+        return None
+
+
+def save_token(path: str, token: str):
+    # 토큰은 비밀값이므로 소유자만 읽을 수 있게 기록
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(token)
+    except OSError as e:
+        logger.warning(f"could not store cortex token in {path}: {e!r}")
+
+
+_current_batch = contextvars.ContextVar("current_batch", default=None)
+
+
 class ID:
     class AUTH:
         GET_USER_LOGIN = 0x10
@@ -81,26 +138,119 @@ class ID:
 
 class Wrapper:
     ws = None
-    __result_dict = dict()
     __running = True
     main = None
     client_id: str
     client_secret: str
-    listeners = list()
 
-    def __init__(self, client_id, client_secret, main):
-        self.url = "wss://localhost:6868"
+    def __init__(self, client_id, client_secret, main, url: str = "wss://localhost:6868", request_timeout: float = 10,
+                 cortex_token: str = None, token_file: str = None,
+                 decoder: frame_decoder.FrameDecoder = None, queue_size: int = None, drop_policy: str = DROP_OLDEST,
+                 executor=None, connect=None, capture: str = None, metrics_port: int = None, reconnect: bool = True,
+                 reconnect_delay: float = 0.5, reconnect_max_delay: float = 30, reconnect_stable: float = 10):
+        self.url = url
         self.loop = asyncio.get_event_loop()
         self.client_id = client_id
         self.client_secret = client_secret
         self.main = main
-
-    def register_listener(self, listener):
+        self.request_timeout = request_timeout
+        # token_file 이 있으면 이전 실행에서 받은 토큰을 재사용하고 새 토큰을 받을 때마다 기록
+        self.token_file = token_file
+        self.cortex_token = cortex_token if cortex_token or not token_file else load_token(token_file)
+        self.decoder = decoder if decoder else frame_decoder.FrameDecoder()
+        self.listeners = list()
+        # queue_size 가 지정되면 스트림 별 큐를 통해 수신 루프와 콜백 실행을 분리
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.executor = executor
+        self.queues: Dict[str, StreamQueue] = dict()
+        # connect 는 url 을 받아 recv/send/close 를 가진 연결을 돌려주는 코루틴 (기본값 websockets.connect)
+        self.connect = connect if connect else websockets.connect
+        self.recorder = FrameRecorder(capture) if capture else None
+        self.metrics = Metrics()
+        self.metrics.add_source(self.__queue_metrics)
+        self.metrics_port = metrics_port
+        # 세션 ID -> 헤드셋 ID
+        self.sessions: Dict[str, str] = dict()
+        # 세션 ID -> 구독 중인 스트림, 재연결 후 다시 구독하는데 사용
+        self.subscriptions: Dict[str, set] = dict()
+        self.reconnect = reconnect
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        # 연결이 이 시간(초) 이상 유지되어야 백오프를 처음 값으로 되돌림
+        self.reconnect_stable = reconnect_stable
+        self.__backoff = reconnect_delay
+        self.__connected_at = None
+        self.__restore_task = None
+        self.__gap_start = None
+        # 연결이 끊겼던 구간 (시작, 끝)
+        self.gaps = list()
+        # 재연결 전 세션/토큰 -> 새 세션/토큰
+        self.__renamed: Dict[str, str] = dict()
+        # (이름, 성공 여부) -> 바운드 핸들러 목록, 세션 전용 리스너는 세션 ID 별로 따로 관리
+        self.__s_routes: Dict[object, list] = dict()
+        self.__f_routes: Dict[object, list] = dict()
+        self.__session_routes: Dict[str, tuple] = dict()
+        # 요청 ID 는 (일련번호 << 8) | 메소드 ID 로 할당되어 응답의 ID 만으로 메소드를 알 수 있음
+        self.__sequence = itertools.count(1)
+        self.__pending: Dict[int, asyncio.Future] = dict()
+
+    def register_listener(self, listener, session: str = None):
+        listener.session = session
         self.listeners.append(listener)
+        self.__build_routes()
+
+    def unregister_listener(self, listener):
+        self.listeners.remove(listener)
+        self.__build_routes()
+
+    def unregister_session(self, session: str):
+        self.listeners = [listener for listener in self.listeners if listener.session != session]
+        self.sessions.pop(session, None)
+        self.__build_routes()
+
+    @staticmethod
+    def __compile_routes(listeners):
+        s_routes = dict()
+        f_routes = dict()
+        for listener in listeners:
+            if type(listener).handle is not Listener.handle:
+                # handle 을 재정의한 리스너는 모든 이벤트를 받음
+                for routes, is_success in ((s_routes, True), (f_routes, False)):
+                    routes.setdefault(None, []).append(
+                        lambda name, data, _listener=listener, _ok=is_success: _listener.handle(name, data, _ok))
+                continue
+
+            for name, handler in listener.s_handlers.items():
+                s_routes.setdefault(name, []).append(types.MethodType(handler, listener))
+            for name, handler in listener.f_handlers.items():
+                f_routes.setdefault(name, []).append(types.MethodType(handler, listener))
+        return s_routes, f_routes
+
+    def __build_routes(self):
+        by_session = dict()
+        for listener in self.listeners:
+            by_session.setdefault(listener.session, []).append(listener)
+
+        self.__s_routes, self.__f_routes = self.__compile_routes(by_session.pop(None, []))
+        self.__session_routes = {session: self.__compile_routes(listeners)
+                                 for (session, listeners) in by_session.items()}
+
+    @staticmethod
+    def __call_routes(routes, name, data):
+        handlers = routes.get(name)
+        if handlers:
+            for handler in handlers:
+                handler(data)
+        handlers = routes.get(None)
+        if handlers:
+            for handler in handlers:
+                handler(name, data)
 
     def __handle_listener(self, name, data, is_success: bool):
-        for listener in self.listeners:
-            listener.handle(name, data, is_success)
+        self.__call_routes(self.__s_routes if is_success else self.__f_routes, name, data)
+        for s_routes, f_routes in self.__session_routes.values():
+            self.__call_routes(s_routes if is_success else f_routes, name, data)
 
     def run(self):
         loop = self.loop
@@ -125,47 +275,279 @@ class Wrapper:
             return future.result()
 
     async def start(self):
-        self.ws = await websockets.connect(self.url)
+        if self.metrics_port is not None and self.metrics.server is None:
+            await self.metrics.serve(port=self.metrics_port)
+        self.ws = await self.connect(self.url)
+        self.__connected_at = time.monotonic()
         asyncio.create_task(self.main())
         self.__handle_listener("start", None, True)
-        await self.__recv_task()
+        while True:
+            await self.__recv_task()
+            # 기록 재생은 파일 끝에서 종료
+            if not self.__running or not self.reconnect or getattr(self.ws, "replay", False):
+                break
+            await self.__reconnect()
+
+    def __next_backoff(self):
+        # 지수 백오프 + 지터, 재연결 사이에도 유지됨
+        wait = self.__backoff * random.uniform(0.5, 1.5)
+        self.__backoff = min(self.__backoff * 2, self.reconnect_max_delay)
+        return wait
+
+    async def __reconnect(self):
+        if self.__gap_start is None:
+            self.__gap_start = time.time()
+        self.__fail_pending(CortexException("Cortex 연결이 끊어졌습니다."))
+
+        # 연결 직후 바로 끊기는 상대에게 쉬지 않고 재연결하지 않도록 연결이 충분히 유지됐을 때만 백오프 초기화
+        uptime = time.monotonic() - self.__connected_at
+        if uptime >= self.reconnect_stable:
+            self.__backoff = self.reconnect_delay
+            logger.warning("cortex connection lost, reconnecting")
+        else:
+            wait = self.__next_backoff()
+            logger.warning(f"cortex connection lost {uptime:.1f}s after connecting, reconnecting in {wait:.1f}s")
+            await asyncio.sleep(wait)
+
+        while self.__running:
+            try:
+                self.ws = await self.connect(self.url)
+                break
+            except Exception as e:
+                self.metrics.error(e)
+                wait = self.__next_backoff()
+                logger.info(f"reconnect failed ({e!r}), retrying in {wait:.1f}s")
+                await asyncio.sleep(wait)
+        self.__connected_at = time.monotonic()
+
+        if self.__running:
+            # 이전 복구가 아직 진행 중이면 취소하고 새 연결에서 다시 복구
+            if self.__restore_task is not None and not self.__restore_task.done():
+                self.__restore_task.cancel()
+            self.__restore_task = asyncio.create_task(self.__restore())
+
+    async def __restore(self):
+        delay = self.reconnect_delay
+        while self.__running:
+            try:
+                await self.restore_sessions()
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics.error(e)
+                logger.warning(f"failed to restore cortex sessions ({e!r}), retrying")
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, self.reconnect_max_delay)
+
+        gap_start, self.__gap_start = self.__gap_start, None
+        gap = {"start": gap_start, "end": time.time()}
+        gap["duration"] = gap["end"] - gap_start
+        self.gaps.append((gap["start"], gap["end"]))
+        logger.warning(f"cortex connection restored after {gap['duration']:.1f}s")
+        self.__handle_listener("reconnect", gap, True)
+
+    async def restore_sessions(self):
+        if not self.sessions and not self.cortex_token:
+            return
+
+        old_token = self.cortex_token
+        await self.request_access()
+        token = await self.get_cortex_token()
+        if old_token and old_token != token:
+            self.__renamed[old_token] = token
+
+        old_sessions = dict(self.sessions)
+        headsets = set(old_sessions.values())
+        await asyncio.gather(*[self.connect_headset(headset) for headset in headsets])
+
+        for old_session, headset in old_sessions.items():
+            res = await self.create_session(token, "active", headset)
+            session = res["id"]
+            self.sessions.pop(old_session, None)
+            self.sessions[session] = headset
+            self.__renamed[old_session] = session
+            for listener in self.listeners:
+                if listener.session == old_session:
+                    listener.session = session
+
+            # 구독이 실패하거나 취소되어 다시 복구할 때도 스트림을 찾을 수 있도록 새 세션에 먼저 옮겨둠
+            streams = self.subscriptions.pop(old_session, None)
+            if streams:
+                self.subscriptions[session] = streams
+            self.__build_routes()
+            if streams:
+                await self.subscribe(token, session, list(streams))
+
+    def __resolve(self, value: str):
+        while value in self.__renamed:
+            value = self.__renamed[value]
+        return value
 
     async def close(self):
         await self.ws.close()
         self.__handle_listener("close", None, True)
         self.__running = False
+        self.__cancel_pending()
+        for queue in self.queues.values():
+            queue.stop()
+        if self.recorder:
+            self.recorder.close()
+        self.metrics.close()
 
     def exit(self):
         self.__running = False
 
     async def __recv_task(self):
+        decode = self.decoder.decode
+        recorder = self.recorder
+        metrics = self.metrics
+        clock = time.perf_counter
         while self.__running:
             try:
                 recv = await asyncio.wait_for(self.ws.recv(), 5)
-                result_dict = json.loads(recv)
-                if "id" in result_dict:
-                    self.__result_dict[result_dict["id"]] = result_dict
-                    if "result" in result_dict:
-                        self.__handle_listener(result_dict["id"], result_dict["result"], True)
-                    elif "error" in result_dict:
-                        self.__handle_listener(result_dict["id"], result_dict["error"], False)
-
-                elif "warning" in result_dict:
-                    logger.warning(result_dict["warning"])
+            except asyncio.TimeoutError:
+                continue
+            except websockets.ConnectionClosed:
+                break
+
+            try:
+                if recorder:
+                    recorder.write(recv)
+                start = clock()
+                kind, name, sid, _time, result_dict = decode(recv)
+                if kind == frame_decoder.STREAM:
+                    metrics.stream(name).observe_frame(clock() - start)
+                    if self.queue_size:
+                        queue = self.queues.get(name)
+                        if queue is None:
+                            queue = self.__create_queue(name)
+                        await queue.put(result_dict)
+                    else:
+                        self.__dispatch_stream(name, result_dict, sid)
+                elif kind == frame_decoder.RESPONSE:
+                    self.__handle_response(result_dict)
+                elif kind == frame_decoder.BATCH:
+                    for response in result_dict:
+                        self.__handle_response(response)
                 else:
-                    self.__handle_listener(list(result_dict)[0], result_dict, True)
+                    logger.warning(result_dict["warning"])
             except Exception as e:
-                pass
+                self.__log_error("failed to handle cortex frame", e)
+
+    def __dispatch_stream(self, name, data: dict, sid: str = None):
+        start = time.perf_counter()
+        try:
+            self.__call_routes(self.__s_routes, name, data)
+            routes = self.__session_routes.get(sid)
+            if routes:
+                self.__call_routes(routes[0], name, data)
+        except Exception as e:
+            self.__log_error(f"{name} handler failed", e)
+        finally:
+            self.metrics.stream(name).observe_handler(time.perf_counter() - start, data.get("time"))
+
+    def __log_error(self, message: str, e: Exception):
+        # 예외 타입마다 처음 한번은 warning 으로 남기고 이후는 debug, 전체 횟수는 metrics 의 cortex_errors_total
+        count = self.metrics.error(e)
+        if count == 1:
+            logger.warning(f"{message}: {e!r} (further {type(e).__name__} errors are logged at debug level)",
+                           exc_info=True)
+        else:
+            logger.debug(f"{message} ({type(e).__name__} #{count})", exc_info=True)
+
+    def __create_queue(self, name):
+        queue = StreamQueue(name, lambda data: self.__dispatch_stream(name, data, data.get("sid")), self.queue_size,
+                            self.drop_policy, self.executor)
+        self.queues[name] = queue
+        queue.start()
+        return queue
+
+    def queue_stats(self):
+        return {name: queue.stats() for (name, queue) in self.queues.items()}
+
+    def __queue_metrics(self):
+        return {
+            "cortex_queue_depth": {name: queue.depth for (name, queue) in self.queues.items()},
+            "cortex_queue_dropped_total": {name: queue.dropped for (name, queue) in self.queues.items()}
+        }
+
+    def __handle_response(self, result_dict: dict):
+        _id = result_dict["id"]
+        method_id = _id & 0xFF if isinstance(_id, int) else _id
 
-    async def __get_response(self, _id):
-        while _id not in self.__result_dict:
-            await asyncio.sleep(0.1)
-        return self.__result_dict.pop(_id)
+        if "result" in result_dict:
+            self.__handle_listener(method_id, result_dict["result"], True)
+        elif "error" in result_dict:
+            self.__handle_listener(method_id, result_dict["error"], False)
+
+        future = self.__pending.pop(_id, None)
+        if future is None:
+            logger.debug(f"no pending request for response id {_id}")
+        elif not future.done():
+            future.set_result(result_dict)
+
+    def __fail_pending(self, e: Exception):
+        for future in self.__pending.values():
+            if not future.done():
+                future.set_exception(e)
+        self.__pending.clear()
+
+    def __cancel_pending(self):
+        for future in self.__pending.values():
+            if not future.done():
+                future.cancel()
+        self.__pending.clear()
+
+    def __allocate_id(self, method_id: int):
+        return next(self.__sequence) << 8 | method_id
+
+    @contextlib.asynccontextmanager
+    async def batch(self):
+        batch = Batch()
+        yield batch
+
+        token = _current_batch.set(batch)
+        try:
+            tasks = [asyncio.ensure_future(request) for request in batch.requests]
+        finally:
+            _current_batch.reset(token)
+
+        try:
+            # 모든 요청이 페이로드를 큐에 넣거나 끝날 때까지 대기 후 하나의 배열로 전송
+            while len(batch.payloads) + sum(task.done() for task in tasks) < len(tasks):
+                batch.queued.clear()
+                queued = asyncio.ensure_future(batch.queued.wait())
+                try:
+                    await asyncio.wait([queued] + [task for task in tasks if not task.done()],
+                                       return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    queued.cancel()
+            batch.flushed = True
+            if batch.payloads:
+                await self.ws.send(json.dumps(batch.payloads))
+            batch.results = await asyncio.gather(*tasks)
+        finally:
+            batch.flushed = True
+            for task in tasks:
+                task.cancel()
+
+    async def __request_api(self, data: dict, timeout: float = None):
+        data["id"] = _id = self.__allocate_id(data["id"])
+        future = asyncio.get_running_loop().create_future()
+        self.__pending[_id] = future
+        batch = _current_batch.get()
+        try:
+            if batch is not None and not batch.flushed:
+                batch.queue(data)
+            else:
+                await self.ws.send(json.dumps(data))
+            result_dict = await asyncio.wait_for(future, timeout if timeout else self.request_timeout)
+        except asyncio.TimeoutError:
+            raise CortexException(f"{data['method']} timed out (id {_id})")
+        finally:
+            self.__pending.pop(_id, None)
 
-    async def __request_api(self, data: dict):
-        _id = data["id"]
-        await self.ws.send(json.dumps(data))
-        result_dict = await self.__get_response(_id)
         logger.debug(data["method"] + " result \r\n" + json.dumps(result_dict, indent=4))
         if "result" in result_dict:
             return result_dict["result"]
@@ -375,32 +757,40 @@ class Wrapper:
     """
 
     async def subscribe(self, cortex_token: str, session: str, streams: List[str]):
+        session = self.__resolve(session)
         payload = {
             "id": ID.SUBSCRIPTION.SUBSCRIBE,
             "jsonrpc": "2.0",
             "method": "subscribe",
             "params": {
-                "cortexToken": cortex_token,
+                "cortexToken": self.__resolve(cortex_token),
                 "session": session,
                 "streams": streams
             }
         }
 
-        return await self.__request_api(payload)
+        res = await self.__request_api(payload)
+        subscribed = self.subscriptions.setdefault(session, set())
+        subscribed.update(stream["streamName"] for stream in res.get("success", []))
+        return res
 
     async def unsubscribe(self, cortex_token: str, session: str, streams: List[str]):
+        session = self.__resolve(session)
         payload = {
             "id": ID.SUBSCRIPTION.UNSUBSCRIBE,
             "jsonrpc": "2.0",
             "method": "unsubscribe",
             "params": {
-                "cortexToken": cortex_token,
+                "cortexToken": self.__resolve(cortex_token),
                 "session": session,
                 "streams": streams
             }
         }
 
-        return await self.__request_api(payload)
+        res = await self.__request_api(payload)
+        subscribed = self.subscriptions.get(session, set())
+        subscribed.difference_update(stream["streamName"] for stream in res.get("success", []))
+        return res
 
     """
     Records
@@ -626,26 +1016,84 @@ class Wrapper:
         client_id = client_id if client_id else self.client_id
         client_secret = client_secret if client_secret else self.client_secret
 
-        headset = await self.get_headset(headset)
-        await self.connect_headset(headset)
-        await self.request_access(client_id, client_secret)
-        res = await self.authorize(client_id, client_secret, debit=debit)
-        token = res["cortexToken"]
+        async with self.batch() as batch:
+            batch.add(self.query_headsets(headset))
+            batch.add(self.request_access(client_id, client_secret))
+        headsets = batch.results[0]
+        if len(headsets) < 1:
+            raise CortexException("기기를 찾을 수 없습니다.")
+        headset = headsets[0]["id"]
+
+        _, token = await asyncio.gather(self.connect_headset(headset),
+                                        self.get_cortex_token(client_id, client_secret, debit))
         res = await self.create_session(token, "active", headset)
         session = res["id"]
+        self.sessions[session] = headset
         return token, session
 
+    async def prepare_sessions(self, headsets: List[str] = None, client_id: str = None, client_secret: str = None,
+                               debit: int = 10):
+        client_id = client_id if client_id else self.client_id
+        client_secret = client_secret if client_secret else self.client_secret
+
+        async with self.batch() as batch:
+            batch.add(self.query_headsets())
+            batch.add(self.request_access(client_id, client_secret))
+        available = [headset["id"] for headset in batch.results[0]]
+
+        if headsets:
+            missing = [headset for headset in headsets if headset not in available]
+            if missing:
+                raise CortexException(f"기기를 찾을 수 없습니다: {', '.join(missing)}")
+        else:
+            headsets = available
+        if len(headsets) < 1:
+            raise CortexException("기기를 찾을 수 없습니다.")
+
+        token, *_ = await asyncio.gather(self.get_cortex_token(client_id, client_secret, debit),
+                                         *[self.connect_headset(headset) for headset in headsets])
+
+        async with self.batch() as batch:
+            for headset in headsets:
+                batch.add(self.create_session(token, "active", headset))
+
+        sessions = dict()
+        for headset, res in zip(headsets, batch.results):
+            sessions[headset] = res["id"]
+            self.sessions[res["id"]] = headset
+        return token, sessions
+
+    async def get_cortex_token(self, client_id: str = None, client_secret: str = None, debit: int = None):
+        if self.cortex_token:
+            try:
+                res = await self.generate_new_token(self.cortex_token, client_id, client_secret)
+                return self.__store_token(res["cortexToken"])
+            except CortexError as e:
+                logger.info(f"cached cortex token rejected, authorizing again ({e})")
+
+        res = await self.authorize(client_id, client_secret, debit=debit)
+        return self.__store_token(res["cortexToken"])
+
+    def __store_token(self, token: str):
+        if self.token_file:
+            save_token(self.token_file, token)
+        self.cortex_token = token
+        return token
+
 
 class Listener:
+    session = None
+
     def __new__(cls, *args, **kwargs):
         s_handlers = {}
         f_handlers = {}
-        for elem, value in cls.__dict__.items():
-            if hasattr(value, "__is_listener__"):
-                if getattr(value, "__is_success__"):
-                    s_handlers[getattr(value, "__listener_name__")] = value
-                else:
-                    f_handlers[getattr(value, "__listener_name__")] = value
+        for klass in reversed(cls.__mro__):
+            for elem, value in klass.__dict__.items():
+                if hasattr(value, "__is_listener__"):
+                    if getattr(value, "__is_success__"):
+                        s_handlers[getattr(value, "__listener_name__")] = value
+                    else:
+                        f_handlers[getattr(value, "__listener_name__")] = value
 
         cls = object.__new__(cls)
         cls.s_handlers = s_handlers
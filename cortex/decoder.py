@@ -0,0 +1,74 @@
+import json
+import time
+
+try:
+    import orjson
+
+    BACKEND = "orjson"
+    loads = orjson.loads
+except ImportError:
+    try:
+        import ujson
+
+        BACKEND = "ujson"
+        loads = ujson.loads
+    except ImportError:
+        BACKEND = "json"
+        loads = json.loads
+
+RESPONSE = 0
+BATCH = 1
+WARNING = 2
+STREAM = 3
+
+class FrameDecoder:
+    frames = 0
+    stream_frames = 0
+    frames_per_second = 0.0
+
+    def __init__(self, loads_func=None, rate_interval: float = 1):
+        self.loads = loads_func if loads_func else loads
+        self.rate_interval = rate_interval
+        self.__window_start = time.monotonic()
+        self.__window_frames = 0
+
+    # (kind, name, sid, time, data) 반환
+    def decode(self, raw):
+        data = self.loads(raw)
+        self.__count()
+
+        if data.__class__ is list:
+            return BATCH, None, None, None, data
+
+        # Cortex 스트림 프레임은 {"<stream>": [...], "sid": ..., "time": ...} 형태이므로
+        # 첫번째 키를 원문에서 바로 잘라내어 dict 키 목록을 만들지 않음
+        name = None
+        if raw[:2] in ('{"', b'{"'):
+            end = raw.find('"' if isinstance(raw, str) else b'"', 2)
+            name = raw[2:end]
+            if not isinstance(name, str):
+                name = name.decode()
+            if name not in data:
+                name = None
+
+        if name is None:
+            name = next(iter(data), None)
+
+        # 경고는 {"jsonrpc": ..., "warning": {...}} 형태로 id 가 없으므로 id 유무로 응답을 구분
+        if "id" in data:
+            return RESPONSE, None, None, None, data
+        if "warning" in data:
+            return WARNING, None, None, None, data
+
+        self.stream_frames += 1
+        return STREAM, name, data.get("sid"), data.get("time"), data
+
+    def __count(self):
+        self.frames += 1
+        self.__window_frames += 1
+        now = time.monotonic()
+        elapsed = now - self.__window_start
+        if elapsed >= self.rate_interval:
+            self.frames_per_second = self.__window_frames / elapsed
+            self.__window_start = now
+            self.__window_frames = 0
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+
+
+class StreamQueue:
+    def __init__(self, name, dispatch, maxsize: int = 256, policy: str = DROP_OLDEST, executor=None):
+        if policy not in (DROP_OLDEST, DROP_NEWEST, BLOCK):
+            raise ValueError(f"unknown drop policy: {policy}")
+
+        self.name = name
+        self.dispatch = dispatch
+        self.policy = policy
+        self.executor = executor
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.processed = 0
+        self.max_depth = 0
+        self.task = None
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.__consume())
+        return self.task
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def put(self, data):
+        queue = self.queue
+        if queue.full():
+            if self.policy == BLOCK:
+                await queue.put(data)
+                self.__update_depth()
+                return
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return
+            queue.get_nowait()
+            queue.task_done()
+
+        queue.put_nowait(data)
+        self.__update_depth()
+
+    def __update_depth(self):
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    async def __consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await self.queue.get()
+            try:
+                if self.executor is not None:
+                    await loop.run_in_executor(self.executor, self.dispatch, data)
+                else:
+                    self.dispatch(data)
+            except Exception:
+                logger.debug(f"{self.name} handler failed", exc_info=True)
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "processed": self.processed
+        }
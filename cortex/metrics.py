@@ -0,0 +1,188 @@
+import asyncio
+import bisect
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+LAG_BUCKETS = (1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # 마지막 칸은 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for i, count in enumerate(self.counts):
+            total += count
+            if total >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99)
+        }
+
+
+class StreamMetrics:
+    __slots__ = ("frames", "frames_per_second", "decode", "handler", "lag", "__window_start", "__window_frames")
+
+    def __init__(self):
+        self.frames = 0
+        self.frames_per_second = 0.0
+        self.decode = Histogram()
+        self.handler = Histogram()
+        self.lag = Histogram(LAG_BUCKETS)
+        self.__window_start = time.monotonic()
+        self.__window_frames = 0
+
+    def observe_frame(self, decode_time: float):
+        self.frames += 1
+        self.decode.observe(decode_time)
+
+        self.__window_frames += 1
+        now = time.monotonic()
+        elapsed = now - self.__window_start
+        if elapsed >= 1:
+            self.frames_per_second = self.__window_frames / elapsed
+            self.__window_start = now
+            self.__window_frames = 0
+
+    def observe_handler(self, handler_time: float, timestamp: float = None):
+        self.handler.observe(handler_time)
+        if timestamp:
+            # Cortex 타임스탬프부터 콜백 완료까지의 지연
+            self.lag.observe(max(time.time() - timestamp, 0.0))
+
+    def snapshot(self):
+        return {
+            "frames": self.frames,
+            "frames_per_second": self.frames_per_second,
+            "decode_seconds": self.decode.snapshot(),
+            "handler_seconds": self.handler.snapshot(),
+            "lag_seconds": self.lag.snapshot()
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.streams: Dict[str, StreamMetrics] = dict()
+        self.errors: Dict[str, int] = dict()
+        self.sources = list()
+        self.server = None
+
+    def stream(self, name: str):
+        metrics = self.streams.get(name)
+        if metrics is None:
+            metrics = self.streams[name] = StreamMetrics()
+        return metrics
+
+    def error(self, e: BaseException):
+        # 해당 예외 타입의 누적 횟수 반환
+        name = type(e).__name__
+        count = self.errors[name] = self.errors.get(name, 0) + 1
+        return count
+
+    def add_source(self, func):
+        # func() 는 {metric 이름: {label 값: 값}} 을 반환 (예: 큐 길이)
+        self.sources.append(func)
+
+    def snapshot(self):
+        return {
+            "streams": {name: stream.snapshot() for (name, stream) in self.streams.items()},
+            "errors": dict(self.errors)
+        }
+
+    def render(self):
+        lines = list()
+
+        def metric(name, kind, helptext):
+            lines.append(f"# HELP {name} {helptext}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        metric("cortex_stream_frames_total", "counter", "Stream frames received.")
+        for name, stream in self.streams.items():
+            lines.append(f'cortex_stream_frames_total{{stream="{name}"}} {stream.frames}')
+
+        metric("cortex_stream_frames_per_second", "gauge", "Stream frames received during the last second.")
+        for name, stream in self.streams.items():
+            lines.append(f'cortex_stream_frames_per_second{{stream="{name}"}} {stream.frames_per_second:.3f}')
+
+        for attr, helptext in (("decode", "Frame decode time."), ("handler", "Listener handler time."),
+                               ("lag", "Cortex timestamp to callback completion.")):
+            metric_name = f"cortex_{attr}_seconds"
+            metric(metric_name, "histogram", helptext)
+            for name, stream in self.streams.items():
+                histogram = getattr(stream, attr)
+                total = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    total += count
+                    lines.append(f'{metric_name}_bucket{{stream="{name}",le="{bound}"}} {total}')
+                lines.append(f'{metric_name}_sum{{stream="{name}"}} {histogram.sum}')
+                lines.append(f'{metric_name}_count{{stream="{name}"}} {histogram.count}')
+
+        metric("cortex_errors_total", "counter", "Errors while receiving or handling frames.")
+        for name, count in self.errors.items():
+            lines.append(f'cortex_errors_total{{type="{name}"}} {count}')
+
+        for source in self.sources:
+            for metric_name, values in source().items():
+                # Prometheus 관례에 따라 _total 로 끝나는 값은 counter
+                kind = "counter" if metric_name.endswith("_total") else "gauge"
+                lines.append(f"# TYPE {metric_name} {kind}")
+                for label, value in values.items():
+                    lines.append(f'{metric_name}{{stream="{label}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+    async def __handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1] in (b"/", b"/metrics"):
+                status, body = "200 OK", self.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii") + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9464):
+        self.server = await asyncio.start_server(self.__handle_http, host, port)
+        logger.info(f"metrics available at http://{host}:{self.server.sockets[0].getsockname()[1]}/metrics")
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import struct
+import time
+
+import websockets
+
+MAGIC = b"CTXLOG1\n"
+# 수신 시각(float64), 프레임 길이(uint32) 다음에 UTF-8 원문
+RECORD = struct.Struct("<dI")
+
+
+class FrameRecorder:
+    def __init__(self, path: str):
+        self.path = path
+        self.frames = 0
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if is_new:
+            self.file.write(MAGIC)
+
+    def write(self, frame, timestamp: float = None):
+        data = frame.encode("utf-8") if isinstance(frame, str) else frame
+        self.file.write(RECORD.pack(timestamp if timestamp else time.time(), len(data)))
+        self.file.write(data)
+        self.frames += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_frames(path: str):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a cortex frame log")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            timestamp, length = RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield timestamp, data.decode("utf-8")
+
+
+class ReplayConnection:
+    # Wrapper 는 replay 연결이 끝나면 재연결하지 않고 종료
+    replay = True
+
+    # speed 1 은 실시간, N 은 N 배속, None 또는 0 은 대기 없이 최대 속도
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self.frames = 0
+        self.sent = list()
+        self.started_at = None
+        self.finished_at = None
+        self.__frames = read_frames(path)
+        self.__first = None
+        self.__next = None
+
+    @classmethod
+    def opener(cls, path: str, speed: float = 1.0):
+        async def connect(url=None):
+            return cls(path, speed)
+
+        return connect
+
+    async def recv(self):
+        # Wrapper 의 수신 타임아웃으로 대기가 취소되어도 프레임을 잃지 않도록 반환할 때까지 보관
+        if self.__next is None:
+            try:
+                self.__next = next(self.__frames)
+            except StopIteration:
+                if self.finished_at is None:
+                    self.finished_at = time.perf_counter()
+                raise websockets.ConnectionClosedOK(None, None)
+        timestamp, frame = self.__next
+
+        now = time.perf_counter()
+        if self.__first is None:
+            self.__first = timestamp
+            self.started_at = now
+        elif self.speed:
+            delay = self.started_at + (timestamp - self.__first) / self.speed - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        self.__next = None
+        self.frames += 1
+        return frame
+
+    async def send(self, data):
+        self.sent.append(data)
+
+    async def close(self):
+        self.__frames.close()
+
+    @property
+    def frames_per_second(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at else time.perf_counter()
+        return self.frames / (end - self.started_at) if end > self.started_at else 0.0
@@ -0,0 +1 @@
+from .server import MockCortex, STREAM_RATES
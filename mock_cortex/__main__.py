@@ -0,0 +1,27 @@
+import argparse
+import asyncio
+import logging
+
+from .server import MockCortex, STREAM_RATES
+
+
+def parse_rate(value: str):
+    name, _, rate = value.partition("=")
+    if name not in STREAM_RATES or not rate:
+        raise argparse.ArgumentTypeError(f"expected <{'|'.join(STREAM_RATES)}>=<hz>, got {value}")
+    return name, float(rate)
+
+
+parser = argparse.ArgumentParser(prog="python -m mock_cortex", description="Mock Emotiv Cortex websocket server")
+parser.add_argument("--host", default="localhost")
+parser.add_argument("--port", type=int, default=6868)
+parser.add_argument("--headsets", type=int, default=1)
+parser.add_argument("--rate", type=parse_rate, action="append", default=[], help="stream rate, e.g. eeg=256")
+parser.add_argument("--jitter", type=float, default=0, help="max random delay per frame in seconds")
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+try:
+    asyncio.run(MockCortex(args.host, args.port, args.headsets, dict(args.rate), args.jitter).serve_forever())
+except KeyboardInterrupt:
+    pass
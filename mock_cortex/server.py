@@ -0,0 +1,258 @@
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Dict
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ["AF3", "F7", "F3", "FC5", "T7", "P7", "O1", "O2", "P8", "T8", "FC6", "F4", "F8", "AF4"]
+BANDS = ["theta", "alpha", "betaL", "betaH", "gamma"]
+
+STREAM_COLS = {
+    "eeg": ["COUNTER", "INTERPOLATED"] + CHANNELS + ["RAW_CQ", "MARKER_HARDWARE", "MARKERS"],
+    "pow": [f"{channel}/{band}" for channel in CHANNELS for band in BANDS],
+    "met": ["eng.isActive", "eng", "exc.isActive", "exc", "lex", "str.isActive", "str", "rel.isActive", "rel",
+            "int.isActive", "int", "foc.isActive", "foc"],
+    "mot": ["COUNTER_MEMS", "INTERPOLATED_MEMS", "Q0", "Q1", "Q2", "Q3", "ACCX", "ACCY", "ACCZ", "MAGX", "MAGY",
+            "MAGZ"]
+}
+
+# 초당 샘플 수
+STREAM_RATES = {
+    "eeg": 128,
+    "pow": 8,
+    "met": 2,
+    "mot": 64
+}
+
+
+class MethodError(Exception):
+    def __init__(self, code, message):
+        self.code = code
+        self.message = message
+
+
+class Connection:
+    def __init__(self, server, ws):
+        self.server = server
+        self.ws = ws
+        self.sessions: Dict[str, str] = dict()
+        self.streams: Dict[tuple, asyncio.Task] = dict()
+
+    def close(self):
+        for task in self.streams.values():
+            task.cancel()
+        self.streams.clear()
+
+    def check_token(self, params):
+        if params.get("cortexToken") not in self.server.tokens:
+            raise MethodError(-32014, "Invalid cortex token.")
+
+    async def stream(self, session, name):
+        rate = self.server.rates.get(name, STREAM_RATES[name])
+        interval = 1 / rate
+        jitter = self.server.jitter
+        counter = itertools.count()
+        make_sample = getattr(self, f"sample_{name}")
+        deadline = time.monotonic()
+        while True:
+            deadline += interval
+            delay = deadline - time.monotonic() + (random.uniform(0, jitter) if jitter else 0)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            frame = {name: make_sample(next(counter)), "sid": session, "time": time.time()}
+            await self.ws.send(json.dumps(frame))
+            self.server.frames_sent += 1
+
+    @staticmethod
+    def sample_eeg(counter):
+        return [counter % 128, 0] + [4200 + random.gauss(0, 20) for _ in CHANNELS] + [0, 0, []]
+
+    @staticmethod
+    def sample_pow(counter):
+        return [random.uniform(0.1, 30) for _ in STREAM_COLS["pow"]]
+
+    @staticmethod
+    def sample_met(counter):
+        sample = []
+        for col in STREAM_COLS["met"]:
+            sample.append(True if col.endswith(".isActive") else random.random())
+        return sample
+
+    @staticmethod
+    def sample_mot(counter):
+        return [counter % 128, 0] + [random.gauss(0, 1) for _ in range(10)]
+
+    """
+    JSON-RPC methods
+    """
+
+    def query_headsets(self, params):
+        headsets = self.server.headsets
+        if "id" in params:
+            headsets = [h for h in headsets if h == params["id"]]
+        return [{"id": h, "status": "connected" if h in self.server.connected else "discovered",
+                 "connectedBy": "dongle"} for h in headsets]
+
+    def control_device(self, params):
+        command = params.get("command")
+        headset = params.get("headset")
+        if command == "refresh":
+            return {"command": command, "message": "Refreshing"}
+        if headset not in self.server.headsets:
+            raise MethodError(-32004, "Headset not found.")
+        if command == "connect":
+            self.server.connected.add(headset)
+        elif command == "disconnect":
+            self.server.connected.discard(headset)
+        else:
+            raise MethodError(-32602, f"Invalid command {command}.")
+        return {"command": command, "message": f"Start {command}ing to headset {headset}."}
+
+    def request_access(self, params):
+        return {"accessGranted": True, "message": "The access right to the application has already been granted."}
+
+    def authorize(self, params):
+        token = uuid.uuid4().hex
+        self.server.tokens.add(token)
+        return {"cortexToken": token, "warning": None}
+
+    def generate_new_token(self, params):
+        self.check_token(params)
+        return self.authorize(params)
+
+    def create_session(self, params):
+        self.check_token(params)
+        headset = params.get("headset")
+        if headset is None:
+            headset = next(iter(self.server.connected), None)
+        if headset not in self.server.connected:
+            raise MethodError(-32152, "No headset connected.")
+        session = str(uuid.uuid4())
+        self.sessions[session] = headset
+        return {"id": session, "status": params.get("status", "open"), "headset": {"id": headset},
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    def subscribe(self, params):
+        self.check_token(params)
+        session = params.get("session")
+        if session not in self.sessions:
+            raise MethodError(-32005, "Session does not exist.")
+
+        success = list()
+        failure = list()
+        for name in params.get("streams", []):
+            if name not in STREAM_COLS:
+                failure.append({"streamName": name, "code": -32016, "message": "Invalid stream name."})
+                continue
+            if (session, name) not in self.streams:
+                self.streams[(session, name)] = asyncio.create_task(self.stream(session, name))
+            success.append({"streamName": name, "cols": STREAM_COLS[name], "sid": session})
+        return {"success": success, "failure": failure}
+
+    def unsubscribe(self, params):
+        self.check_token(params)
+        session = params.get("session")
+        success = list()
+        for name in params.get("streams", []):
+            task = self.streams.pop((session, name), None)
+            if task:
+                task.cancel()
+            success.append({"streamName": name, "message": "Unsubscribe successfully", "sid": session})
+        return {"success": success, "failure": []}
+
+    METHODS = {
+        "queryHeadsets": query_headsets,
+        "controlDevice": control_device,
+        "requestAccess": request_access,
+        "authorize": authorize,
+        "generateNewToken": generate_new_token,
+        "createSession": create_session,
+        "subscribe": subscribe,
+        "unsubscribe": unsubscribe
+    }
+
+    def call(self, request: dict):
+        response = {"id": request.get("id"), "jsonrpc": "2.0"}
+        method = self.METHODS.get(request.get("method"))
+        try:
+            if method is None:
+                raise MethodError(-32601, "Method not found.")
+            response["result"] = method(self, request.get("params", {}))
+        except MethodError as e:
+            response["error"] = {"code": e.code, "message": e.message}
+        return response
+
+    async def serve(self):
+        async for message in self.ws:
+            try:
+                request = json.loads(message)
+            except ValueError:
+                await self.ws.send(json.dumps({"id": None, "jsonrpc": "2.0",
+                                               "error": {"code": -32700, "message": "Parse error."}}))
+                continue
+
+            if isinstance(request, list):
+                response = [self.call(r) for r in request]
+            else:
+                response = self.call(request)
+            await self.ws.send(json.dumps(response))
+
+
+class MockCortex:
+    def __init__(self, host: str = "localhost", port: int = 6868, headsets: int = 1, rates: dict = None,
+                 jitter: float = 0):
+        self.host = host
+        self.port = port
+        self.headsets = [f"MOCK-{i + 1:04d}" for i in range(headsets)]
+        self.rates = dict(rates) if rates else dict()
+        self.jitter = jitter
+        self.connected = set()
+        self.tokens = set()
+        self.frames_sent = 0
+        self.server = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def __handler(self, ws, *args):
+        connection = Connection(self, ws)
+        try:
+            await connection.serve()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            connection.close()
+
+    async def start(self):
+        self.server = await websockets.serve(self.__handler, self.host, self.port)
+        if self.port == 0:
+            self.port = next(iter(self.server.sockets)).getsockname()[1]
+        logger.info(f"mock cortex listening on {self.url} with {len(self.headsets)} headset(s)")
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await asyncio.Future()
+        finally:
+            await self.stop()
@@ -0,0 +1,3 @@
+from .api_server import main
+
+main()
@@ -1,15 +1,61 @@
-import RPi.GPIO as GPIO
+import json
+import threading
+
+from flask import Response, request
 from flask_restful import Resource, reqparse
 
-LED_PIN = 1
-MOTOR_PIN = 2
+from . import hardware
+from .state import ActuatorState
+
+MAX_WAIT = 30
+HEARTBEAT = 15
+
+state = ActuatorState()
+
+worker = None
+_worker_lock = threading.Lock()
+
+speed_parser = reqparse.RequestParser()
+speed_parser.add_argument("speed", type=int, location="args")
+
+wait_parser = reqparse.RequestParser()
+wait_parser.add_argument("since", type=int, location="args")
+wait_parser.add_argument("wait", type=float, default=MAX_WAIT, location="args")
+
+# EventSource 는 다시 연결할 때 Last-Event-ID 헤더로 마지막 버전을 보냄
+events_parser = reqparse.RequestParser()
+events_parser.add_argument("Last-Event-ID", type=int, dest="last", location="headers")
+events_parser.add_argument("since", type=int, default=-1, location="args")
+
+
+def init_hardware(mock: bool = None):
+    global worker
+    with _worker_lock:
+        if worker is None:
+            worker = hardware.HardwareWorker(hardware.create_backend(mock)).start()
+        return worker
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(LED_PIN, GPIO.OUT)
-GPIO.setup(MOTOR_PIN, GPIO.OUT)
 
-pwm = GPIO.PWM()
-pwm.start(0)
+def apply(led: bool = None, speed: int = None):
+    if led is not None:
+        led = bool(led)
+    if speed is not None:
+        speed = int(speed)
+    # 핀 쓰기는 하드웨어 스레드에 맡기고 바로 반환
+    (worker if worker is not None else init_hardware()).submit(led, speed)
+    return state.update(led, speed)
+
+
+def set_led(on: bool):
+    return apply(led=on)
+
+
+def set_speed(speed: int):
+    return apply(speed=speed)
+
+
+def get_speed():
+    return state.speed
 
 
 class LEDController:
@@ -17,7 +63,7 @@ class LEDController:
         @staticmethod
         def get():
             try:
-                GPIO.output(LED_PIN, True)
+                set_led(True)
                 return {"status": "Success"}
             except Exception as e:
                 return {"status": "Fail", "reason": str(e)}
@@ -26,24 +72,19 @@ class LEDController:
         @staticmethod
         def get():
             try:
-                GPIO.output(LED_PIN, False)
+                set_led(False)
                 return {"status": "Success"}
             except Exception as e:
                 return {"status": "Fail", "reason": str(e)}
 
 
 class MotorController:
-    speed = 0
-
     class SetSpeed(Resource):
         @staticmethod
         def get():
             try:
-                parser = reqparse.RequestParser()
-                parser.add_argument("speed", type=int)
-                args = parser.parse_args()
-                MotorController.speed = args.get("speed", 0)
-                pwm.ChangeDutyCycle(MotorController.speed)
+                args = speed_parser.parse_args()
+                set_speed(args.get("speed") or 0)
                 return {"status": "Success"}
             except Exception as e:
                 return {"status": "Fail", "reason": str(e)}
@@ -52,6 +93,55 @@ class MotorController:
         @staticmethod
         def get():
             try:
-                return {"status": "Success", "value": MotorController.speed}
+                return {"status": "Success", "value": get_speed()}
+            except Exception as e:
+                return {"status": "Fail", "reason": str(e)}
+
+
+class ActuatorController:
+    class State(Resource):
+        @staticmethod
+        def get():
+            try:
+                args = wait_parser.parse_args()
+                if args.get("since") is None:
+                    return {"status": "Success", "value": state.snapshot()}
+                # 롱 폴링: since 이후 상태가 바뀌거나 wait 초가 지날 때까지 대기
+                wait = min(max(args.get("wait"), 0), MAX_WAIT)
+                return {"status": "Success", "value": state.wait(args.get("since"), wait)}
+            except Exception as e:
+                return {"status": "Fail", "reason": str(e)}
+
+        @staticmethod
+        def post():
+            try:
+                changes = request.get_json(force=True)
+                unknown = set(changes) - {"led", "speed"}
+                if unknown:
+                    raise ValueError(f"unknown actuators: {', '.join(sorted(unknown))}")
+                return {"status": "Success", "value": apply(changes.get("led"), changes.get("speed"))}
+            except Exception as e:
+                return {"status": "Fail", "reason": str(e)}
+
+        patch = post
+
+    class Events(Resource):
+        @staticmethod
+        def get():
+            def stream(version):
+                snapshot = state.snapshot()
+                while True:
+                    if snapshot["version"] > version:
+                        version = snapshot["version"]
+                        yield f"id: {version}\nevent: state\ndata: {json.dumps(snapshot)}\n\n"
+                    else:
+                        yield ": keep-alive\n\n"
+                    snapshot = state.wait(version, HEARTBEAT)
+
+            try:
+                args = events_parser.parse_args()
             except Exception as e:
                 return {"status": "Fail", "reason": str(e)}
+            last = args.get("last")
+            return Response(stream(args.get("since") if last is None else last), mimetype="text/event-stream",
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,15 +1,49 @@
+import argparse
+import logging
+
 from flask import Flask
 from flask_restful import Api
 
-from api import LEDController, MotorController
+from . import channel
+from .api import ActuatorController, LEDController, MotorController, init_hardware
+
+
+def create_app():
+    app = Flask(__name__)
+    api = Api(app)
+
+    api.add_resource(LEDController.On, "/led/on")
+    api.add_resource(LEDController.Off, "/led/off")
+
+    api.add_resource(MotorController.SetSpeed, "/motor/set_speed")
+    api.add_resource(MotorController.GetSpeed, "/motor/get_speed")
+
+    api.add_resource(ActuatorController.State, "/actuators")
+    api.add_resource(ActuatorController.Events, "/actuators/events")
+
+    return app
+
 
-app = Flask(__name__)
-api = Api(app)
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rasp_server", description="LED / motor actuator server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--channel-port", type=int, default=5001, help="line-delimited JSON command channel, 0 to disable")
+    parser.add_argument("--threads", type=int, default=8, help="worker threads, each open event stream holds one")
+    parser.add_argument("--debug", action="store_true", help="use the Flask development server")
+    parser.add_argument("--mock", action="store_true", default=None,
+                        help="record pin writes in memory instead of driving GPIO (also RASP_MOCK=1)")
+    args = parser.parse_args(argv)
 
-api.add_resource(LEDController.On, "/led/on")
-api.add_resource(LEDController.Off, "/led/off")
+    logging.basicConfig(level=logging.INFO)
+    init_hardware(args.mock)
+    if args.channel_port:
+        channel.start_thread(args.host, args.channel_port)
 
-api.add_resource(MotorController.SetSpeed, "/motor/set_speed")
-api.add_resource(MotorController.GetSpeed, "/motor/get_speed")
+    app = create_app()
+    if args.debug:
+        app.run(host=args.host, port=args.port, debug=True, use_reloader=False)
+    else:
+        import waitress
 
-app.run(host="0.0.0.0", debug=True)
+        waitress.serve(app, host=args.host, port=args.port, threads=args.threads)
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import logging
+import socket
+import threading
+
+from . import api
+
+logger = logging.getLogger(__name__)
+
+
+# 한 줄에 하나의 JSON 명령: {"seq": 1, "cmd": "led", "value": true}
+# 응답도 한 줄: {"seq": 1, "status": "Success"} 또는 {"seq": 1, "status": "Fail", "reason": "..."}
+def execute(command: dict):
+    cmd = command.get("cmd")
+    if cmd == "led":
+        api.set_led(bool(command.get("value")))
+        return {}
+    elif cmd == "set_speed":
+        api.set_speed(int(command.get("value", 0)))
+        return {}
+    elif cmd == "get_speed":
+        return {"value": api.get_speed()}
+    elif cmd == "apply":
+        value = command.get("value", {})
+        return {"value": api.apply(value.get("led"), value.get("speed"))}
+    elif cmd == "state":
+        return {"value": api.state.snapshot()}
+    elif cmd == "ping":
+        return {}
+    raise ValueError(f"unknown command: {cmd}")
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    peer = writer.get_extra_info("peername")
+    logger.info(f"channel client connected: {peer}")
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+
+            seq = None
+            try:
+                command = json.loads(line)
+                seq = command.get("seq")
+                response = {"seq": seq, "status": "Success"}
+                response.update(execute(command))
+            except Exception as e:
+                response = {"seq": seq, "status": "Fail", "reason": str(e)}
+
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        logger.info(f"channel client disconnected: {peer}")
+        writer.close()
+
+
+async def serve(host: str = "0.0.0.0", port: int = 5001):
+    server = await asyncio.start_server(handle_client, host, port)
+    logger.info(f"command channel listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def start_thread(host: str = "0.0.0.0", port: int = 5001):
+    thread = threading.Thread(target=asyncio.run, args=(serve(host, port),), name="command-channel", daemon=True)
+    thread.start()
+    return thread
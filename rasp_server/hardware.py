@@ -0,0 +1,171 @@
+import collections
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LED_PIN = 1
+MOTOR_PIN = 2
+PWM_FREQUENCY = 100
+
+
+def clamp_duty(duty):
+    return max(0.0, min(float(duty), 100.0))
+
+
+class GPIOBackend:
+    def __init__(self, led_pin: int = LED_PIN, motor_pin: int = MOTOR_PIN, frequency: int = PWM_FREQUENCY):
+        # 라즈베리 파이가 아닌 곳에서도 모듈을 불러올 수 있도록 사용할 때 import
+        import RPi.GPIO as GPIO
+
+        self.GPIO = GPIO
+        self.led_pin = led_pin
+        self.motor_pin = motor_pin
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(led_pin, GPIO.OUT)
+        GPIO.setup(motor_pin, GPIO.OUT)
+        self.pwm = GPIO.PWM(motor_pin, frequency)
+        self.pwm.start(0)
+
+    def set_led(self, on: bool):
+        self.GPIO.output(self.led_pin, on)
+
+    def set_duty(self, duty: float):
+        self.pwm.ChangeDutyCycle(duty)
+
+    def close(self):
+        self.pwm.stop()
+        self.GPIO.cleanup()
+
+
+class MockBackend:
+    # 실제 핀 대신 (시간, 핀, 값) 기록을 남김
+    def __init__(self, led_pin: int = LED_PIN, motor_pin: int = MOTOR_PIN, history: int = 10000):
+        self.led_pin = led_pin
+        self.motor_pin = motor_pin
+        self.led = False
+        self.duty = 0.0
+        self.writes = 0
+        self.events = collections.deque(maxlen=history)
+
+    def set_led(self, on: bool):
+        self.led = on
+        self.writes += 1
+        self.events.append((time.monotonic(), self.led_pin, on))
+
+    def set_duty(self, duty: float):
+        self.duty = duty
+        self.writes += 1
+        self.events.append((time.monotonic(), self.motor_pin, duty))
+
+    def close(self):
+        pass
+
+
+def create_backend(mock: bool = None):
+    # RASP_MOCK=1 이면 하드웨어 없이 실행
+    if mock is None:
+        mock = os.environ.get("RASP_MOCK", "") not in ("", "0")
+    return MockBackend() if mock else GPIOBackend()
+
+
+class HardwareWorker:
+    # 모든 핀 쓰기를 하나의 스레드에서 처리하여 요청 핸들러는 바로 반환
+    def __init__(self, backend, ramp_step: float = 5, ramp_interval: float = 0.01):
+        self.backend = backend
+        self.ramp_step = ramp_step
+        self.ramp_interval = ramp_interval
+        self.led = None
+        self.duty = 0.0
+        self.target = 0.0
+        self.commands = 0
+        self.__queue = queue.Queue()
+        self.__idle = threading.Event()
+        self.__idle.set()
+        self.__thread = None
+
+    def start(self):
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, name="hardware-worker", daemon=True)
+            self.__thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        if self.__thread is not None:
+            self.__queue.put(None)
+            self.__thread.join(timeout)
+            self.__thread = None
+        self.backend.close()
+
+    def submit(self, led: bool = None, speed: float = None):
+        self.__idle.clear()
+        self.__queue.put((led, speed))
+
+    def wait_idle(self, timeout: float = None):
+        return self.__idle.wait(timeout)
+
+    def __run(self):
+        while True:
+            # 램핑 중에는 다음 단계까지만 기다리고, 목표에 도달하면 다음 명령까지 대기
+            ramping = self.duty != self.target
+            try:
+                item = self.__queue.get(timeout=self.ramp_interval if ramping else None)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+
+            # 밀린 명령은 LED / 속도 각각 마지막 값으로 합쳐서 한번만 적용
+            led = speed = None
+            stop = False
+            while item:
+                self.commands += 1
+                if item[0] is not None:
+                    led = item[0]
+                if item[1] is not None:
+                    speed = item[1]
+                try:
+                    item = self.__queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+            self.__apply(led, speed)
+            if stop:
+                break
+
+            try:
+                self.__step()
+            except Exception as e:
+                # 쓰기에 실패하면 램핑을 멈추고 다음 명령을 기다림
+                logger.warning(f"motor write failed: {e!r}")
+                self.target = self.duty
+
+            if self.duty == self.target and self.__queue.empty():
+                self.__idle.set()
+
+    def __apply(self, led, speed):
+        if speed is not None:
+            self.target = clamp_duty(speed)
+        if led is not None and led != self.led:
+            try:
+                self.backend.set_led(led)
+                self.led = led
+            except Exception as e:
+                logger.warning(f"led write failed: {e!r}")
+
+    def __step(self):
+        if self.duty == self.target:
+            return
+        # 한번에 ramp_step 만큼만 변경하여 모터에 급격한 변화를 주지 않음
+        if self.ramp_step:
+            delta = self.target - self.duty
+            duty = self.target if abs(delta) <= self.ramp_step else self.duty + (
+                self.ramp_step if delta > 0 else -self.ramp_step)
+        else:
+            duty = self.target
+        self.backend.set_duty(duty)
+        self.duty = duty
@@ -0,0 +1,34 @@
+import threading
+
+
+class ActuatorState:
+    def __init__(self):
+        self.led = False
+        self.speed = 0
+        self.version = 0
+        self.__condition = threading.Condition()
+
+    def snapshot(self):
+        with self.__condition:
+            return {"version": self.version, "led": self.led, "speed": self.speed}
+
+    def update(self, led: bool = None, speed: int = None):
+        with self.__condition:
+            changed = False
+            if led is not None and led != self.led:
+                self.led = led
+                changed = True
+            if speed is not None and speed != self.speed:
+                self.speed = speed
+                changed = True
+            # 값이 그대로면 버전을 올리지 않아 롱 폴링/SSE 구독자를 깨우지 않음
+            if changed:
+                self.version += 1
+                self.__condition.notify_all()
+            return {"version": self.version, "led": self.led, "speed": self.speed}
+
+    def wait(self, version: int, timeout: float = None):
+        # version 보다 새로운 상태가 될 때까지 대기, 시간 초과시 현재 상태 반환
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.version > version, timeout)
+            return {"version": self.version, "led": self.led, "speed": self.speed}
@@ -0,0 +1,23 @@
+import argparse
+import logging
+import sys
+
+from .sfsb import StartupProfiler, create_app
+
+parser = argparse.ArgumentParser(prog="python -m sfsb", description="Drowsiness monitoring with Emotiv Cortex")
+parser.add_argument("-c", "--config", help="path to config.yml (default: sfsb/config.yml or $SFSB_CONFIG)")
+parser.add_argument("--profile-startup", action="store_true",
+                    help="report import and initialization time per phase, then exit")
+parser.add_argument("-v", "--verbose", action="store_true")
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+profiler = StartupProfiler()
+app = create_app(args.config, profiler)
+
+if args.profile_startup:
+    profiler.report(sys.stdout)
+    sys.exit(0)
+
+app.run()
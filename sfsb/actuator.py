@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+LED = "led"
+MOTOR = "motor"
+
+
+class CommandCoalescer:
+    def __init__(self, client, interval: float = 0.1, max_rate: float = 10, loop=None):
+        self.client = client
+        self.interval = interval
+        self.min_gap = 1 / max_rate if max_rate else 0
+        self.loop = loop if loop else asyncio.get_event_loop()
+        self.sent = 0
+        self.coalesced = 0
+        self.suppressed = 0
+        self.failed = 0
+        self.__pending = dict()
+        self.__state = dict()
+        # 전송 중인 값, 전송이 끝나기 전에 들어온 명령은 이 값과 비교
+        self.__inflight = dict()
+        self.__last_send = 0.0
+        self.__flush_task = None
+
+    def set_led(self, on: bool):
+        self.submit(LED, bool(on))
+
+    def set_motor_speed(self, speed: int):
+        self.submit(MOTOR, int(speed))
+
+    @property
+    def state(self):
+        return dict(self.__state)
+
+    def submit(self, key, value):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is not self.loop:
+            # executor 스레드에서 호출된 경우 이벤트 루프로 넘김
+            self.loop.call_soon_threadsafe(self.submit, key, value)
+            return
+
+        if key in self.__pending:
+            # 같은 구간 안의 명령은 마지막 값만 전송
+            self.coalesced += 1
+            self.__pending[key] = value
+        elif self.__current(key) == value:
+            self.suppressed += 1
+            return
+        else:
+            self.__pending[key] = value
+
+        if self.__flush_task is None:
+            self.__flush_task = self.loop.create_task(self.__flush_later())
+
+    def __current(self, key):
+        return self.__inflight[key] if key in self.__inflight else self.__state.get(key)
+
+    async def __flush_later(self):
+        try:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+        finally:
+            self.__flush_task = None
+            if self.__pending:
+                self.__flush_task = self.loop.create_task(self.__flush_later())
+
+    async def flush(self):
+        if len(self.__pending) > 1 and hasattr(self.client, "apply"):
+            await self.__flush_batch()
+
+        while self.__pending:
+            key, value = self.__pending.popitem()
+            if self.__current(key) == value:
+                self.suppressed += 1
+                continue
+
+            wait = self.__last_send + self.min_gap - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.__last_send = time.monotonic()
+
+            self.__inflight[key] = value
+            try:
+                await self.__send(key, value)
+                self.__state[key] = value
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"{key}={value} command failed: {e!r}")
+            finally:
+                self.__inflight.pop(key, None)
+
+    async def __flush_batch(self):
+        # 여러 액추에이터의 변경을 한번의 요청으로 보냄
+        changes = {key: value for (key, value) in self.__pending.items() if self.__current(key) != value}
+        self.suppressed += len(self.__pending) - len(changes)
+        self.__pending.clear()
+        if not changes:
+            return
+
+        wait = self.__last_send + self.min_gap - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self.__last_send = time.monotonic()
+
+        self.__inflight.update(changes)
+        try:
+            await self.client.apply(led=changes.get(LED), speed=changes.get(MOTOR))
+            self.__state.update(changes)
+            self.sent += len(changes)
+        except Exception as e:
+            self.failed += len(changes)
+            logger.warning(f"{changes} command failed: {e!r}")
+        finally:
+            for key in changes:
+                self.__inflight.pop(key, None)
+
+    async def __send(self, key, value):
+        if key == LED:
+            return await (self.client.led_on() if value else self.client.led_off())
+        elif key == MOTOR:
+            return await self.client.motor_set_speed(value)
+        raise ValueError(f"unknown actuator: {key}")
+
+    async def close(self):
+        if self.__flush_task is not None:
+            self.__flush_task.cancel()
+            self.__flush_task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "suppressed": self.suppressed,
+            "failed": self.failed,
+            "pending": len(self.__pending)
+        }
+
+
+def create_client(config, backend: str = None):
+    # Actuator.Backend : http (Raspberry Pi REST), channel (Raspberry Pi TCP), serial (Arduino 직결)
+    backend = backend if backend else config.get("Actuator.Backend", "http")
+    if backend == "http":
+        from .raspberry import RaspberryClient
+
+        return RaspberryClient()
+    elif backend == "channel":
+        from .raspberry import ChannelClient
+
+        return ChannelClient()
+    elif backend == "serial":
+        from .serial_actuator import SerialActuator
+
+        return SerialActuator(baudrate=config.get("Arduino.Baudrate", 115200))
+    raise ValueError(f"unknown actuator backend: {backend}")
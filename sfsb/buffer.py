@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, cols, size: int = 256):
+        self.cols = list(cols)
+        self.size = size
+        # 0 번 열은 Cortex 타임스탬프
+        self.index = {col: i + 1 for i, col in enumerate(self.cols)}
+        self.index["time"] = 0
+        # 같은 샘플을 i, i + size 두 곳에 기록하여 최근 size 개의 구간이 항상 연속된 뷰가 되도록 함
+        self.data = np.zeros((size * 2, len(self.cols) + 1), dtype=np.float64)
+        self.count = 0
+
+    def append(self, timestamp, values):
+        pos = self.count % self.size
+        row = self.data[pos + self.size]
+        row[0] = timestamp
+        try:
+            row[1:] = values
+        except TypeError:
+            row[1:] = [np.nan if v is None else v for v in values]
+        self.data[pos] = row
+        self.count += 1
+        return row
+
+    def window(self, n: int = None):
+        n = min(n if n else self.size, self.size, self.count)
+        end = (self.count - 1) % self.size + self.size + 1
+        return self.data[end - n:end]
+
+    def column(self, col, n: int = None):
+        return self.window(n)[:, self.index[col]]
+
+    def reset(self):
+        self.count = 0
+
+
+class Sample:
+    __slots__ = ("buffer", "row")
+
+    def __init__(self, buffer: RingBuffer, row=None):
+        self.buffer = buffer
+        self.row = row
+
+    def __getitem__(self, col):
+        return self.row[self.buffer.index[col]]
+
+    def __contains__(self, col):
+        return col in self.buffer.index
+
+    @property
+    def index(self):
+        return self.buffer.index
+
+    @property
+    def time(self):
+        return self.row[0]
+
+    def get(self, col, default=None):
+        index = self.buffer.index.get(col)
+        return default if index is None else self.row[index]
+
+    def to_dict(self):
+        return {col: self.row[i] for (col, i) in self.buffer.index.items()}
@@ -1,45 +1,52 @@
-import numpy as np
+from .features import FeatureSet
+from .rules import RuleEngine
 
-__eye_timestamp = list()
-__eye_warning = list()
+# pow_handler 가 사용하는 특징, 설정의 Features 로 추가 가능
+FEATURES = FeatureSet({
+    "eye_flicker": {"ratio": ["theta", "gamma"], "channels": ["AF3", "AF4"]},
+})
 
+# 기본 탐지 규칙, 설정의 Rules 에서 같은 이름으로 바꾸거나 null 로 끌 수 있음
+RULES = {
+    # 눈 깜빡임 지표의 최근 10 샘플 평균이 20 을 넘은 경우가 최근 10 번 중 6 번 이상
+    "drowsiness": {
+        "stream": "pow",
+        "expr": "eye_flicker",
+        "window": 10,
+        "above": 20,
+        "vote": [6, 10],
+        "activate": {"led": True, "log": "경고"},
+        "deactivate": {"led": False}
+    },
+    # 보정된 기준값이 없으므로 기본으로는 끔, 설정의 Rules 에서 측정한 값으로 켬
+    #   stress:
+    #     stream: met
+    #     expr: (exc + str) / (foc + rel)
+    #     window: 10
+    #     above: <기준값>
+    "stress": None
+}
 
-def pow_handler(data):
-    right = data["AF3/theta"] / data["AF3/gamma"]
-    left = data["AF4/theta"] / data["AF4/gamma"]
+engine = RuleEngine(RULES)
 
-    flicker = (right + left) / 2
 
-    if len(__eye_timestamp) > 10:
-        __eye_timestamp.pop(0)
-        __eye_warning.pop(0)
+def setup(rules: dict = None, actuator=None):
+    global engine
+    engine = RuleEngine({**RULES, **(rules or {})}, actuator)
+    return engine
 
-    __eye_timestamp.append(flicker)
 
-    eye_flicker_std = np.std(__eye_timestamp)
-    eye_flicker_mean = np.mean(__eye_timestamp)
+def reset(gap=None):
+    engine.reset()
 
-    if 20 < eye_flicker_mean:
-        __eye_warning.append(True)
-    else:
-        __eye_warning.append(False)
 
-    if __eye_warning.count(True) > 5:
-        # TODO 경고 메세지 전송
-        print("경고")
+def pow_handler(data, headset=None):
+    engine.handle("pow", data, headset)
 
 
-def met_handler(data):
-    eng = data["eng"]
-    exc = data["exc"]
-    stress = data["str"]
-    rel = data["rel"]
-    interest = data["int"]
-    foc = data["foc"]
+def met_handler(data, headset=None):
+    engine.handle("met", data, headset)
 
-    val = (exc + stress) / (foc + rel)
-    print(val)
 
-
-def mot_handler(data):
-    pass
+def mot_handler(data, headset=None):
+    engine.handle("mot", data, headset)
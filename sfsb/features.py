@@ -0,0 +1,149 @@
+import numpy as np
+
+RATIO = "ratio"
+MEAN = "mean"
+ASYMMETRY = "asymmetry"
+
+
+def channel_bands(index):
+    # pow 열 이름은 "<채널>/<대역>" 형태
+    channels = dict()
+    for col in index:
+        if "/" in col:
+            channel, band = col.split("/", 1)
+            channels.setdefault(channel, set()).add(band)
+    return channels
+
+
+# pow 스트림의 특징 선언, 예:
+#   eye_flicker: {ratio: [theta, gamma], channels: [AF3, AF4]}   채널별 theta / gamma 의 평균
+#   alpha:       {mean: alpha}                                     channels 가 없으면 모든 채널의 alpha 평균
+#   frontal:     {asymmetry: alpha, pairs: [[F3, F4]]}             ln(F4/alpha) - ln(F3/alpha) 의 평균
+class FeatureSet:
+    def __init__(self, specs: dict = None):
+        self.specs = dict(specs) if specs else dict()
+
+    def __len__(self):
+        return len(self.specs)
+
+    def merge(self, specs: dict):
+        return FeatureSet({**self.specs, **(specs or {})})
+
+    def compile(self, index):
+        return FeatureExtractor(self.specs, index)
+
+
+class FeatureExtractor:
+    # 구독 시점에 열 인덱스 배열로 한번 변환해두고 샘플(1차원) 또는 배치(2차원) 단위로 한번에 계산
+    def __init__(self, specs: dict, index):
+        self.names = list(specs)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.size = len(self.names)
+        self.groups = list()
+
+        available = channel_bands(index)
+        terms = {RATIO: ([], [], [], []), MEAN: ([], [], [], []), ASYMMETRY: ([], [], [], [])}
+        for position, (name, spec) in enumerate(specs.items()):
+            kind, pairs = self.__terms(name, spec, index, available)
+            first, second, offsets, positions = terms[kind]
+            offsets.append(len(first))
+            positions.append(position)
+            for a, b in pairs:
+                first.append(a)
+                second.append(b)
+
+        for kind, (first, second, offsets, positions) in terms.items():
+            if not positions:
+                continue
+            counts = np.diff(offsets + [len(first)])
+            if positions == list(range(positions[0], positions[-1] + 1)):
+                # 연속된 위치는 슬라이스로 기록하여 복사 없이 대입
+                positions = slice(positions[0], positions[-1] + 1)
+            else:
+                positions = np.array(positions, dtype=np.intp)
+            self.groups.append((kind, np.array(first, dtype=np.intp), np.array(second, dtype=np.intp),
+                                np.array(offsets, dtype=np.intp), counts.astype(np.float64), positions))
+
+    @staticmethod
+    def __terms(name, spec, index, available):
+        def col(channel, band):
+            try:
+                return index[f"{channel}/{band}"]
+            except KeyError:
+                raise ValueError(f"feature {name}: no column {channel}/{band}") from None
+
+        def channels(*bands):
+            selected = spec.get("channels")
+            if selected is None:
+                selected = sorted(c for (c, b) in available.items() if b.issuperset(bands))
+            if not selected:
+                raise ValueError(f"feature {name}: no channel has {', '.join(bands)}")
+            return selected
+
+        if RATIO in spec:
+            numerator, denominator = spec[RATIO]
+            return RATIO, [(col(c, numerator), col(c, denominator)) for c in channels(numerator, denominator)]
+        elif MEAN in spec:
+            band = spec[MEAN]
+            return MEAN, [(col(c, band), 0) for c in channels(band)]
+        elif ASYMMETRY in spec:
+            band = spec[ASYMMETRY]
+            pairs = spec.get("pairs")
+            if not pairs:
+                raise ValueError(f"feature {name}: asymmetry needs pairs of [left, right] channels")
+            return ASYMMETRY, [(col(left, band), col(right, band)) for (left, right) in pairs]
+        raise ValueError(f"feature {name}: unknown feature type {spec!r}")
+
+    def __call__(self, rows, out=None):
+        rows = np.asarray(rows)
+        if out is None:
+            out = np.empty(rows.shape[:-1] + (self.size,), dtype=np.float64)
+
+        # 대역 값이 0 이면 numpy 규칙에 따라 inf / nan 이 됨
+        for kind, first, second, offsets, counts, positions in self.groups:
+            if kind == RATIO:
+                terms = rows.take(first, axis=-1) / rows.take(second, axis=-1)
+            elif kind == MEAN:
+                terms = rows.take(first, axis=-1)
+            else:
+                terms = np.log(rows.take(second, axis=-1) / rows.take(first, axis=-1))
+            out[..., positions] = np.add.reduceat(terms, offsets, axis=-1) / counts
+        return out
+
+
+class Features:
+    __slots__ = ("extractor", "values", "sample", "columns")
+
+    def __init__(self, extractor: FeatureExtractor, values=None, sample=None):
+        self.extractor = extractor
+        self.values = values
+        self.sample = sample
+        # 규칙 식에서 원시 열과 특징을 함께 쓸 수 있도록 원시 행 뒤에 특징 값을 이어붙인 인덱스
+        if sample is None:
+            self.columns = extractor.index
+        else:
+            offset = max(sample.index.values()) + 1
+            self.columns = {**sample.index, **{name: offset + i for (name, i) in extractor.index.items()}}
+
+    def __getitem__(self, name):
+        return self.values[self.extractor.index[name]]
+
+    def __contains__(self, name):
+        return name in self.extractor.index
+
+    @property
+    def index(self):
+        return self.columns
+
+    @property
+    def row(self):
+        if self.sample is None:
+            return self.values
+        return np.concatenate((self.sample.row, self.values))
+
+    def get(self, name, default=None):
+        index = self.extractor.index.get(name)
+        return default if index is None else self.values[index]
+
+    def to_dict(self):
+        return {name: self.values[i] for (name, i) in self.extractor.index.items()}
@@ -1,9 +1,13 @@
-from utils import config
+import os
+
+from .utils import config
+
+CONFIG_FILE = os.environ.get("SFSB_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yml"))
 
 
 class Config:
-    config = config.YAMLConfiguration("config.yml")
-    config.load()
+    # 처음 get 할 때 읽어들이고, 이후 파일이 바뀌면 다시 읽음
+    config = config.YAMLConfiguration(CONFIG_FILE)
 
 
 class Metrics:
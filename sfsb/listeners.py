@@ -1,55 +1,116 @@
+import operator
+
 import cortex
 
+from . import spectral
+from .buffer import RingBuffer, Sample
+from .features import FeatureSet, Features
 
-class PowerListener(cortex.Listener):
-    cols: list
 
-    def __init__(self, callback):
+class StreamBuffer(cortex.Listener):
+    stream: str
+    buffer: RingBuffer = None
+    sample: Sample = None
+
+    def __init__(self, callback, size: int = 256):
         self.callback = callback
+        self.size = size
+        self.s_handlers[self.stream] = type(self).handle_sample
+
+    def on_buffer(self):
+        pass
 
     @cortex.Listener.handler(cortex.ID.SUBSCRIPTION.SUBSCRIBE)
     def handle_subscribe(self, data):
         for stream in data["success"]:
-            if stream["streamName"] == "pow":
-                self.cols = stream["cols"]
+            if stream["streamName"] == self.stream and (self.session is None or stream.get("sid") == self.session):
+                self.buffer = RingBuffer(stream["cols"], self.size)
+                self.sample = Sample(self.buffer)
+                self.on_buffer()
 
-    @cortex.Listener.handler("pow")
-    def handle_pow(self, data):
-        dat = {k: v for (k, v) in zip(self.cols, data["pow"])}
-        self.callback(dat)
+    @cortex.Listener.handler("reconnect")
+    def handle_reconnect(self, gap):
+        # 끊김 전후의 데이터가 한 윈도우에 섞이지 않도록 비움
+        if self.buffer is not None:
+            self.buffer.reset()
 
+    def handle_sample(self, data):
+        self.sample.row = self.buffer.append(data["time"], data[self.stream])
+        self.callback(self.sample)
 
-class MetricListener(cortex.Listener):
-    cols: list
 
+class GapListener(cortex.Listener):
     def __init__(self, callback):
         self.callback = callback
 
-    @cortex.Listener.handler(cortex.ID.SUBSCRIPTION.SUBSCRIBE)
-    def handle_subscribe(self, data):
-        for stream in data["success"]:
-            if stream["streamName"] == "met":
-                self.cols = stream["cols"]
+    @cortex.Listener.handler("reconnect")
+    def handle_reconnect(self, gap):
+        self.callback(gap)
 
-    @cortex.Listener.handler("met")
-    def handle_metric(self, data):
-        dat = {k: v for (k, v) in zip(self.cols, data["met"])}
-        self.callback(dat)
 
+class PowerListener(StreamBuffer):
+    stream = "pow"
+    features: Features = None
 
-class MotionListener(cortex.Listener):
-    cols: list
+    def __init__(self, callback, size: int = 256, features: FeatureSet = None):
+        super().__init__(callback, size)
+        self.feature_set = features
 
-    def __init__(self, callback):
-        self.callback = callback
+    def on_buffer(self):
+        # 특징이 선언되어 있으면 구독된 열 순서에 맞춰 한번만 컴파일하고 콜백에는 원시 샘플을 포함한 특징 값을 전달
+        if self.feature_set:
+            self.features = Features(self.feature_set.compile(self.buffer.index), sample=self.sample)
+
+    def handle_sample(self, data):
+        self.emit(data["time"], data[self.stream])
+
+    def emit(self, timestamp, values):
+        row = self.sample.row = self.buffer.append(timestamp, values)
+        if self.features is None:
+            self.callback(self.sample)
+        else:
+            self.features.values = self.features.extractor(row)
+            self.callback(self.features)
+
+
+class EEGPowerListener(PowerListener):
+    # 원시 eeg 로 대역 파워를 직접 계산하여 PowerListener 와 같은 "<채널>/<대역>" 형태로 전달
+    stream = "eeg"
+    estimator: spectral.BandPower = None
+
+    def __init__(self, callback, size: int = 256, features: FeatureSet = None, method: str = spectral.WELCH,
+                 **options):
+        super().__init__(callback, size, features)
+        self.method = method
+        self.options = options
+        self.pick = None
+
+    def on_buffer(self):
+        cols = self.buffer.cols
+        channels = spectral.eeg_channels(cols)
+        indices = [cols.index(channel) for channel in channels]
+        # itemgetter 는 인덱스가 하나면 튜플이 아닌 값 하나를 반환
+        self.pick = operator.itemgetter(*indices) if len(indices) > 1 else lambda row: (row[indices[0]],)
+        self.estimator = spectral.create(self.method, channels, **self.options)
+        self.buffer = RingBuffer(self.estimator.cols, self.size)
+        self.sample = Sample(self.buffer)
+        super().on_buffer()
+
+    @cortex.Listener.handler("reconnect")
+    def handle_reconnect(self, gap):
+        super().handle_reconnect(gap)
+        if self.estimator is not None:
+            self.estimator.reset()
+
+    def handle_sample(self, data):
+        power = self.estimator.push(self.pick(data[self.stream]))
+        if power is not None:
+            self.emit(data["time"], power)
+
+
+class MetricListener(StreamBuffer):
+    stream = "met"
 
-    @cortex.Listener.handler(cortex.ID.SUBSCRIPTION.SUBSCRIBE)
-    def handle_subscribe(self, data):
-        for stream in data["success"]:
-            if stream["streamName"] == "mot":
-                self.cols = stream["cols"]
 
-    @cortex.Listener.handler("mot")
-    def handle_metric(self, data):
-        dat = {k: v for (k, v) in zip(self.cols, data["mot"])}
-        self.callback(dat)
+class MotionListener(StreamBuffer):
+    stream = "mot"
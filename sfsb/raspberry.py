@@ -1,35 +1,225 @@
+import asyncio
+import itertools
 import json
+import logging
+import socket
+from urllib.parse import urlparse
 
-import requests
+import aiohttp
 
-from global_variable import Config
+from .global_variable import Config
 
-SERVER_URL = Config.config.get("Raspberry.Server_URL")
+logger = logging.getLogger(__name__)
 
 
-def led_on():
-    url = f"{SERVER_URL}/led/on"
-    req = requests.get(url)
-    data = json.loads(req.text)
-    return data
+class RaspberryClient:
+    session: aiohttp.ClientSession = None
 
+    def __init__(self, server_url: str = None, timeout: float = 2, retries: int = 2, retry_delay: float = 0.05,
+                 pool_size: int = 4):
+        self.server_url = (server_url if server_url else Config.config.get("Raspberry.Server_URL")).rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.pool_size = pool_size
 
-def led_off():
-    url = f"{SERVER_URL}/led/off"
-    req = requests.get(url)
-    data = json.loads(req.text)
-    return data
+    async def __aenter__(self):
+        return self
 
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
 
-def motor_set_speed(speed: int):
-    url = f"{SERVER_URL}/motor/set_speed?speed={speed}"
-    req = requests.get(url)
-    data = json.loads(req.text)
-    return data
+    def __get_session(self):
+        if self.session is None or self.session.closed:
+            # keep-alive 커넥션을 재사용하여 요청마다 새로 연결하지 않음
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
 
+    def retarget(self, server_url: str):
+        # 같은 세션으로 다음 요청부터 새 주소 사용
+        self.server_url = server_url.rstrip("/")
 
-def motor_get_speed():
-    url = f"{SERVER_URL}/motor/get_speed"
-    req = requests.get(url)
-    data = json.loads(req.text)
-    return data
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __request(self, path: str, params: dict = None, method: str = "GET", body: dict = None,
+                        timeout: float = None):
+        url = f"{self.server_url}{path}"
+        session = self.__get_session()
+        kwargs = {"params": params, "json": body}
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.request(method, url, **kwargs) as res:
+                    return await res.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    raise
+                logger.debug(f"{url} failed ({e!r}), retrying")
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    async def led_on(self):
+        return await self.__request("/led/on")
+
+    async def led_off(self):
+        return await self.__request("/led/off")
+
+    async def motor_set_speed(self, speed: int):
+        return await self.__request("/motor/set_speed", {"speed": speed})
+
+    async def motor_get_speed(self):
+        return await self.__request("/motor/get_speed")
+
+    async def apply(self, led: bool = None, speed: int = None):
+        changes = dict()
+        if led is not None:
+            changes["led"] = led
+        if speed is not None:
+            changes["speed"] = speed
+        return await self.__request("/actuators", method="POST", body=changes)
+
+    async def state(self):
+        return await self.__request("/actuators")
+
+    async def wait_for_change(self, since: int, wait: float = 30):
+        return await self.__request("/actuators", {"since": since, "wait": wait}, timeout=wait + self.timeout)
+
+    async def watch(self, since: int = -1):
+        # 서버가 보내는 상태 변경 이벤트(SSE)를 차례로 돌려줌
+        url = f"{self.server_url}/actuators/events"
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout)
+        async with self.__get_session().get(url, params={"since": since}, timeout=timeout) as res:
+            data = list()
+            async for line in res.content:
+                line = line.decode("utf-8").rstrip("\r\n")
+                if line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    yield json.loads("\n".join(data))
+                    data = list()
+
+    @staticmethod
+    async def fan_out(*commands):
+        return await asyncio.gather(*commands, return_exceptions=True)
+
+
+class ChannelClient:
+    reader: asyncio.StreamReader = None
+    writer: asyncio.StreamWriter = None
+
+    def __init__(self, host: str = None, port: int = None, timeout: float = 1, retries: int = 1):
+        self.host = host if host else urlparse(Config.config.get("Raspberry.Server_URL")).hostname
+        self.port = port if port else Config.config.get("Raspberry.Channel_Port", 5001)
+        self.timeout = timeout
+        self.retries = retries
+        self.__sequence = itertools.count(1)
+        self.__pending = dict()
+        self.__reader_task = None
+        self.__lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def __connect(self):
+        async with self.__lock:
+            if self.writer is not None:
+                return
+            self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                              self.timeout)
+            sock = self.writer.get_extra_info("socket")
+            if sock is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.__reader_task = asyncio.create_task(self.__read_acks(self.reader))
+
+    async def __read_acks(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                ack = json.loads(line)
+                future = self.__pending.pop(ack.get("seq"), None)
+                if future is not None and not future.done():
+                    future.set_result(ack)
+        except (ConnectionError, ValueError) as e:
+            logger.debug(f"command channel read failed: {e!r}")
+        finally:
+            self.__disconnect(ConnectionError("command channel closed"))
+
+    def __disconnect(self, e: Exception):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+        for future in self.__pending.values():
+            if not future.done():
+                future.set_exception(e)
+        self.__pending.clear()
+
+    def retarget(self, server_url: str):
+        # 지금 연결을 끊고 다음 명령에서 새 호스트로 연결
+        self.host = urlparse(server_url).hostname
+        if self.__reader_task is not None:
+            self.__reader_task.cancel()
+            self.__reader_task = None
+        self.__disconnect(ConnectionError("command channel moved"))
+
+    async def close(self):
+        if self.__reader_task is not None:
+            self.__reader_task.cancel()
+            self.__reader_task = None
+        self.__disconnect(ConnectionError("command channel closed"))
+
+    async def __command(self, cmd: str, value=None):
+        for attempt in range(self.retries + 1):
+            try:
+                await self.__connect()
+                seq = next(self.__sequence)
+                future = self.__pending[seq] = asyncio.get_running_loop().create_future()
+                command = {"seq": seq, "cmd": cmd}
+                if value is not None:
+                    command["value"] = value
+                self.writer.write(json.dumps(command).encode("utf-8") + b"\n")
+                try:
+                    return await asyncio.wait_for(future, self.timeout)
+                finally:
+                    self.__pending.pop(seq, None)
+            except (ConnectionError, OSError) as e:
+                self.__disconnect(e)
+                if attempt >= self.retries:
+                    raise
+                logger.debug(f"command channel {cmd} failed ({e!r}), reconnecting")
+
+    async def led_on(self):
+        return await self.__command("led", True)
+
+    async def led_off(self):
+        return await self.__command("led", False)
+
+    async def motor_set_speed(self, speed: int):
+        return await self.__command("set_speed", speed)
+
+    async def motor_get_speed(self):
+        return await self.__command("get_speed")
+
+    async def apply(self, led: bool = None, speed: int = None):
+        changes = dict()
+        if led is not None:
+            changes["led"] = led
+        if speed is not None:
+            changes["speed"] = speed
+        return await self.__command("apply", changes)
+
+    async def state(self):
+        return await self.__command("state")
+
+    @staticmethod
+    async def fan_out(*commands):
+        return await asyncio.gather(*commands, return_exceptions=True)
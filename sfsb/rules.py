@@ -0,0 +1,276 @@
+import ast
+import logging
+import math
+
+import numpy as np
+
+from .utils.rolling import RollingCount, RollingWindow
+
+logger = logging.getLogger(__name__)
+
+MEAN = "mean"
+STD = "std"
+
+ACTIONS = frozenset(("led", "motor", "log"))
+# YAML 은 on / off 를 불리언으로 읽으므로 activate / deactivate 를 씀
+KEYS = frozenset(("stream", "expr", "window", "aggregate", "above", "below", "hysteresis", "vote", "activate",
+                  "deactivate"))
+
+# 식에서 쓸 수 있는 함수 (샘플 단위, 배치 단위)
+FUNCTIONS = {
+    "abs": (abs, np.abs),
+    "min": (min, np.minimum),
+    "max": (max, np.maximum),
+    "log": (math.log, np.log),
+    "exp": (math.exp, np.exp),
+    "sqrt": (math.sqrt, np.sqrt)
+}
+
+ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+                 ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+
+
+def identifier(col: str):
+    # "AF3/theta" -> AF3_theta, "eng.isActive" -> eng_isActive
+    return col.replace("/", "_").replace(".", "_")
+
+
+class Expression:
+    def __init__(self, source: str):
+        self.source = source
+        self.tree = ast.parse(str(source), mode="eval")
+        for node in ast.walk(self.tree):
+            if not isinstance(node, ALLOWED_NODES):
+                raise ValueError(f"{source!r}: {type(node).__name__} is not allowed")
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                    raise ValueError(f"{source!r}: only {', '.join(FUNCTIONS)} can be called")
+            elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+                raise ValueError(f"{source!r}: only numeric constants are allowed")
+
+        functions = {node.func for node in ast.walk(self.tree) if isinstance(node, ast.Call)}
+        self.names = sorted({node.id for node in ast.walk(self.tree)
+                             if isinstance(node, ast.Name) and node not in functions})
+
+    def resolve(self, index, batch: bool = False):
+        # 열 이름을 행의 인덱스로 바꾼 소스, batch 이면 (샘플, 열) 배열의 열 단위로 계산
+        columns = {identifier(col): i for (col, i) in index.items()}
+        missing = [name for name in self.names if name not in columns]
+        if missing:
+            raise ValueError(f"{self.source!r}: unknown columns {', '.join(missing)}")
+
+        names = self.names
+
+        class Resolve(ast.NodeTransformer):
+            def visit_Call(self, node):
+                node.args = [self.visit(arg) for arg in node.args]
+                node.func = ast.Name(id=f"_{node.func.id}", ctx=ast.Load())
+                return node
+
+            def visit_Name(self, node):
+                if node.id not in names:
+                    return node
+                key = f"r[:, {columns[node.id]}]" if batch else f"r[{columns[node.id]}]"
+                return ast.parse(key, mode="eval").body
+
+        return ast.unparse(Resolve().visit(ast.parse(str(self.source), mode="eval")).body)
+
+    def compile(self, index, batch: bool = False):
+        return compile_lambda(self.resolve(index, batch), batch, self.source)
+
+
+def compile_lambda(body: str, batch: bool = False, name: str = "rules"):
+    namespace = {"__builtins__": {}}
+    namespace.update({f"_{func}": funcs[1 if batch else 0] for (func, funcs) in FUNCTIONS.items()})
+    return eval(compile(f"lambda r: {body}", f"<{name}>", "eval"), namespace)
+
+
+class RuleState:
+    __slots__ = ("window", "votes", "flag", "active")
+
+    def __init__(self, window: RollingWindow = None, votes: RollingCount = None):
+        self.window = window
+        self.votes = votes
+        self.reset()
+
+    def reset(self):
+        if self.window is not None:
+            self.window.reset()
+        if self.votes is not None:
+            self.votes.reset()
+        self.flag = False
+        self.active = False
+
+
+# 설정의 Rules 항목 예:
+#   drowsiness:
+#     stream: pow
+#     expr: eye_flicker                  스트림 열과 특징에 대한 식, "/" 와 "." 는 "_" 로 씀
+#     window: 10                         최근 10 샘플의 aggregate (mean, std)
+#     above: 20                          또는 below
+#     hysteresis: 0                      해제는 above - hysteresis 이하 (below + hysteresis 이상)
+#     vote: [6, 10]                      최근 10 번 중 6 번 이상 넘으면 활성
+#     activate: {led: true, log: 졸음}   활성 / 비활성으로 바뀔 때 실행
+#     deactivate: {led: false}
+class Rule:
+    def __init__(self, name: str, spec: dict):
+        unknown = set(spec) - KEYS
+        if unknown:
+            raise ValueError(f"rule {name}: unknown keys {', '.join(sorted(map(str, unknown)))}")
+        self.name = name
+        self.stream = spec.get("stream", "pow")
+        self.expression = Expression(spec["expr"])
+        self.window = spec.get("window")
+        self.aggregate = spec.get("aggregate", MEAN)
+        if self.aggregate not in (MEAN, STD):
+            raise ValueError(f"rule {name}: unknown aggregate {self.aggregate}")
+
+        if ("above" in spec) == ("below" in spec):
+            raise ValueError(f"rule {name}: set exactly one of above or below")
+        self.above = "above" in spec
+        self.threshold = float(spec["above"] if self.above else spec["below"])
+        hysteresis = float(spec.get("hysteresis", 0))
+        self.release = self.threshold - hysteresis if self.above else self.threshold + hysteresis
+
+        vote = spec.get("vote")
+        self.votes, self.vote_window = (int(vote[0]), int(vote[1])) if vote else (None, None)
+
+        self.activate = dict(spec.get("activate") or {})
+        self.deactivate = dict(spec.get("deactivate") or {})
+        unknown = (set(self.activate) | set(self.deactivate)) - ACTIONS
+        if unknown:
+            raise ValueError(f"rule {name}: unknown actions {', '.join(sorted(unknown))}")
+
+        self.__compiled = dict()
+
+    def evaluator(self, index, batch: bool = False):
+        key = (id(index), batch)
+        cached = self.__compiled.get(key)
+        if cached is None or cached[0] is not index:
+            cached = self.__compiled[key] = (index, self.expression.compile(index, batch))
+        return cached[1]
+
+    def new_state(self):
+        return RuleState(RollingWindow(self.window) if self.window else None,
+                         RollingCount(self.vote_window) if self.votes else None)
+
+    def update(self, state: RuleState, value):
+        # 샘플 하나에 대해 O(1) 로 상태를 갱신하고 활성 상태가 바뀌면 True 반환
+        window = state.window
+        if window is not None:
+            mean = window.push(value)
+            value = mean if self.aggregate == MEAN else window.std
+
+        if state.flag:
+            state.flag = value > self.release if self.above else value < self.release
+        else:
+            state.flag = value > self.threshold if self.above else value < self.threshold
+
+        active = state.flag if state.votes is None else state.votes.push(state.flag) >= self.votes
+        if active == state.active:
+            return False
+        state.active = active
+        return True
+
+    def evaluate(self, rows, index):
+        # 버퍼 윈도우 등 여러 샘플의 식 값을 numpy 로 한번에 계산
+        return self.evaluator(index, batch=True)(np.asarray(rows))
+
+
+class RuleGroup:
+    # 한 스트림의 규칙 식들을 튜플을 반환하는 하나의 lambda 로 컴파일하여 샘플마다 한번만 호출
+    def __init__(self, rules):
+        self.rules = rules
+        self.index = None
+        self.evaluate = None
+        self.singles = None
+        self.disabled = list()
+
+    def compile(self, index):
+        bodies = list()
+        self.singles = list()
+        self.disabled = list()
+        for rule in self.rules:
+            try:
+                body = rule.expression.resolve(index)
+            except ValueError as e:
+                logger.error(f"rule {rule.name} disabled: {e}")
+                self.disabled.append(rule.name)
+                body = "None"
+            bodies.append(body)
+            self.singles.append(compile_lambda(body, name=rule.name))
+        self.evaluate = compile_lambda(f"({', '.join(bodies)},)", name=f"{self.rules[0].stream} rules")
+        self.index = index
+
+    def __call__(self, row, index):
+        # 구독마다 열 배치가 다를 수 있으므로 index 가 바뀌었을 때만 다시 컴파일
+        if index is not self.index:
+            self.compile(index)
+        try:
+            return self.evaluate(row)
+        except (ArithmeticError, ValueError):
+            # 0 으로 나누기, log(0) 등은 해당 규칙만 건너뜀
+            return [safe_call(func, row) for func in self.singles]
+
+
+def safe_call(func, row):
+    try:
+        return func(row)
+    except (ArithmeticError, ValueError):
+        return None
+
+
+class RuleEngine:
+    def __init__(self, specs: dict = None, actuator=None):
+        self.rules = [Rule(name, spec) for (name, spec) in (specs or {}).items() if spec]
+        self.actuator = actuator
+        self.streams = dict()
+        for rule in self.rules:
+            self.streams.setdefault(rule.stream, list()).append(rule)
+        # (스트림, 헤드셋) 별 컴파일된 식과 규칙 상태
+        self.groups = dict()
+        self.states = dict()
+        self.fired = 0
+
+    def handle(self, stream: str, data, headset=None):
+        key = (stream, headset)
+        group = self.groups.get(key)
+        if group is None:
+            rules = self.streams.get(stream)
+            if not rules:
+                return
+            group = self.groups[key] = RuleGroup(rules)
+            self.states[key] = [rule.new_state() for rule in rules]
+
+        # numpy 스칼라보다 파이썬 float 연산이 빠르므로 한번만 변환
+        values = group(data.row.tolist(), data.index)
+        for rule, state, value in zip(group.rules, self.states[key], values):
+            # 값이 없는 샘플 (nan, None) 은 윈도우에 넣지 않음
+            if value is not None and value == value and rule.update(state, value):
+                self.fire(rule, state.active, headset)
+
+    def fire(self, rule: Rule, active: bool, headset=None):
+        self.fired += 1
+        actions = rule.activate if active else rule.deactivate
+        message = actions.get("log")
+        if message:
+            logger.warning(f"[{headset}] {rule.name}: {message}")
+        else:
+            logger.info(f"[{headset}] {rule.name} {'active' if active else 'inactive'}")
+
+        if self.actuator is None:
+            return
+        if "led" in actions:
+            self.actuator.set_led(actions["led"])
+        if "motor" in actions:
+            self.actuator.set_motor_speed(actions["motor"])
+
+    def active(self, headset=None):
+        return [rule.name for ((stream, h), states) in self.states.items() if h == headset
+                for (rule, state) in zip(self.streams[stream], states) if state.active]
+
+    def reset(self, headset=None):
+        for (stream, h), states in self.states.items():
+            if headset is None or h == headset:
+                for state in states:
+                    state.reset()
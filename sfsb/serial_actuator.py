@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import struct
+
+from .global_variable import Config
+
+logger = logging.getLogger(__name__)
+
+# arduino/arduino.ino 와 같은 프레임 : [0xA5][명령][값(uint16 LE)][순번][CRC-8]
+FRAME_START = 0xA5
+FRAME = struct.Struct("<BBHBB")
+
+CMD_LED = 0x01
+CMD_MOTOR = 0x02
+CMD_GET_MOTOR = 0x03
+CMD_GET_LED = 0x04
+CMD_PING = 0x05
+ACK = 0x80
+CMD_ERROR = 0xFF
+
+# 보드가 이전 순번을 버리는 상태 변경 명령, 보드는 명령별로 순번을 따로 비교함
+STATE_COMMANDS = frozenset((CMD_LED, CMD_MOTOR))
+
+
+def crc8(data: bytes):
+    crc = 0
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def encode_frame(command: int, value: int, seq: int):
+    body = struct.pack("<BHB", command, value & 0xFFFF, seq)
+    return bytes((FRAME_START,)) + body + bytes((crc8(body),))
+
+
+class FrameParser:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.errors = 0
+
+    def feed(self, data: bytes):
+        self.buffer += data
+        frames = list()
+        while True:
+            start = self.buffer.find(FRAME_START)
+            if start < 0:
+                self.buffer.clear()
+                break
+            del self.buffer[:start]
+            if len(self.buffer) < FRAME.size:
+                break
+
+            _, command, value, seq, crc = FRAME.unpack_from(self.buffer)
+            if crc8(self.buffer[1:FRAME.size - 1]) != crc:
+                # 시작 바이트가 값 안에 있었을 수 있으므로 한 바이트만 건너뛰고 다시 동기화
+                self.errors += 1
+                del self.buffer[:1]
+                continue
+
+            del self.buffer[:FRAME.size]
+            frames.append((command, value, seq))
+        return frames
+
+
+class SerialActuator:
+    reader: asyncio.StreamReader = None
+    writer: asyncio.StreamWriter = None
+
+    def __init__(self, port: str = None, baudrate: int = 115200, timeout: float = 0.2, retries: int = 3):
+        self.port = port if port else Config.config.get("Arduino.Port")
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.retries = retries
+        self.sent = 0
+        self.retransmits = 0
+        self.failed = 0
+        self.parser = FrameParser()
+        # 명령 -> 마지막으로 할당한 순번, (명령, 순번) -> 응답 future
+        self.__seq = dict()
+        self.__pending = dict()
+        self.__reader_task = None
+        self.__lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        async with self.__lock:
+            if self.writer is not None:
+                return
+            import serial_asyncio
+
+            self.reader, self.writer = await serial_asyncio.open_serial_connection(url=self.port,
+                                                                                   baudrate=self.baudrate)
+            self.__reader_task = asyncio.create_task(self.__read_acks())
+            # 보드는 LED / 모터 명령의 이전 순번을 버리므로 연결할 때 핑으로 순번 기록을 초기화
+            try:
+                await self.__exchange(CMD_PING, 0)
+            except Exception:
+                await self.close()
+                raise
+
+    async def close(self):
+        if self.__reader_task is not None:
+            self.__reader_task.cancel()
+            self.__reader_task = None
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+        for future in self.__pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("serial port closed"))
+        self.__pending.clear()
+
+    async def __read_acks(self):
+        while True:
+            data = await self.reader.read(64)
+            if not data:
+                break
+            for command, value, seq in self.parser.feed(data):
+                # 오류 응답은 값에 원래 명령을 담고 있음
+                key = (value, seq) if command == CMD_ERROR else (command & ~ACK, seq)
+                future = self.__pending.get(key)
+                if future is None or future.done():
+                    continue
+                if command == CMD_ERROR:
+                    future.set_exception(ValueError(f"device rejected command 0x{value:02x}"))
+                else:
+                    future.set_result((command & ~ACK, value))
+
+    def __next_seq(self, command: int):
+        # 보드의 128 순번 창이 다른 명령으로 밀리지 않도록 명령별로 순번을 할당
+        seq = self.__seq.get(command, 0)
+        for _ in range(256):
+            seq = (seq + 1) & 0xFF
+            if (command, seq) not in self.__pending:
+                self.__seq[command] = seq
+                return seq
+        raise RuntimeError("too many commands in flight")
+
+    async def __command(self, command: int, value: int = 0):
+        await self.open()
+        return await self.__exchange(command, value)
+
+    async def __exchange(self, command: int, value: int):
+        seq = self.__next_seq(command)
+        key = (command, seq)
+        future = self.__pending[key] = asyncio.get_running_loop().create_future()
+        frame = encode_frame(command, value, seq)
+        try:
+            for attempt in range(self.retries + 1):
+                # 쓰기는 버퍼에만 넣고 바로 돌아감, 응답이 없으면 같은 순번으로 재전송
+                self.writer.write(frame)
+                if attempt:
+                    self.retransmits += 1
+                try:
+                    _, acked = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+                except asyncio.TimeoutError:
+                    logger.debug(f"no ack for 0x{command:02x} seq {seq}, retransmitting")
+                    continue
+                break
+            else:
+                self.failed += 1
+                raise TimeoutError(f"no ack from {self.port} for command 0x{command:02x}")
+
+            # 응답 값이 요청과 다르면 보드가 이 명령을 이전 순번으로 보고 버린 것
+            # 같은 명령을 그 뒤에 보낸 경우에만 정상 (마지막 명령이 이김)
+            if command in STATE_COMMANDS and acked != (int(value != 0) if command == CMD_LED else value) \
+                    and self.__seq[command] == seq:
+                self.failed += 1
+                raise ValueError(f"device ignored command 0x{command:02x} (seq {seq}), current value {acked}")
+            self.sent += 1
+            return {"status": "Success", "value": acked}
+        finally:
+            self.__pending.pop(key, None)
+
+    async def led_on(self):
+        return await self.__command(CMD_LED, 1)
+
+    async def led_off(self):
+        return await self.__command(CMD_LED, 0)
+
+    async def motor_set_speed(self, speed: int):
+        return await self.__command(CMD_MOTOR, max(0, min(int(speed), 255)))
+
+    async def motor_get_speed(self):
+        return await self.__command(CMD_GET_MOTOR)
+
+    async def led_state(self):
+        return await self.__command(CMD_GET_LED)
+
+    async def ping(self):
+        return await self.__command(CMD_PING)
+
+    @staticmethod
+    async def fan_out(*commands):
+        return await asyncio.gather(*commands, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "retransmits": self.retransmits,
+            "failed": self.failed,
+            "checksum_errors": self.parser.errors,
+            "in_flight": len(self.__pending)
+        }
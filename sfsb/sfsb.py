@@ -1,33 +1,180 @@
 import asyncio
+import contextlib
+import functools
+import logging
+import os
+import sys
+import time
 
-from apscheduler.schedulers.background import BackgroundScheduler
+logger = logging.getLogger(__name__)
 
-import callbacks
-import cortex
-import listeners
-import weather
-from global_variable import Config, Metrics
+DEFAULT_URL = "wss://localhost:6868"
+TOKEN_FILE = ".cortex_token"
 
+# 설정 EEG 섹션의 키 -> spectral 추정기 인자
+EEG_OPTIONS = {
+    "Rate": "rate",
+    "Window": "window",
+    "Hop": "hop",
+    "Segment": "segment",
+    "Overlap": "overlap",
+    "Bands": "bands"
+}
 
-def weather_job():
-    Metrics.current_weather = weather.get_weather("Busan,KR")
 
+class StartupProfiler:
+    def __init__(self):
+        self.phases = list()
+        self.started = time.perf_counter()
 
-async def main():
-    token, session = await api.prepare()
-    await api.subscribe(token, session, ["pow", "met"])
-    await asyncio.sleep(600)
-    await api.unsubscribe(token, session, ["pow", "met"])
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
 
+    def report(self, file=sys.stderr):
+        total = time.perf_counter() - self.started
+        width = max([len(name) for (name, _) in self.phases] + [5])
+        for name, elapsed in self.phases:
+            print(f"{name:<{width}} {elapsed * 1000:>9.1f} ms", file=file)
+        print(f"{'total':<{width}} {total * 1000:>9.1f} ms", file=file)
 
-api = cortex.Wrapper(client_id=Config.config.get("Emotiv.Client_ID"),
-                     client_secret=Config.config.get("Emotiv.Client_Secret"),
-                     main=main)
-api.register_listener(listeners.PowerListener(callbacks.pow_handler))
-api.register_listener(listeners.MetricListener(callbacks.met_handler))
 
-scheduler = BackgroundScheduler()
-scheduler.start()
-scheduler.add_job(weather_job, "interval", minutes=5)
+class App:
+    def __init__(self, config, api, weather_provider, scheduler_factory, callbacks, listeners, metrics,
+                 actuator=None):
+        self.config = config
+        self.api = api
+        self.weather_provider = weather_provider
+        self.scheduler_factory = scheduler_factory
+        self.callbacks = callbacks
+        self.listeners = listeners
+        self.metrics = metrics
+        self.actuator = actuator
+        self.scheduler = None
 
-api.run()
+    async def weather_job(self):
+        self.metrics.current_weather = await self.weather_provider.get("Busan,KR")
+
+    def power_listener(self, callback, features, eeg: dict = None):
+        if not eeg:
+            return self.listeners.PowerListener(callback, features=features)
+
+        options = {key: eeg[name] for (name, key) in EEG_OPTIONS.items() if name in eeg}
+        return self.listeners.EEGPowerListener(callback, features=features, method=eeg.get("Method", "welch"),
+                                               **options)
+
+    async def main(self):
+        api = self.api
+        # Emotiv.Headsets 가 없으면 찾은 모든 헤드셋에 대해 세션 생성
+        token, sessions = await api.prepare_sessions(self.config.get("Emotiv.Headsets", None))
+        features = self.callbacks.FEATURES.merge(self.config.get("Features", None))
+        self.callbacks.setup(self.config.get("Rules", None), self.actuator)
+        self.config.subscribe("Rules", self.reload_rules)
+        # EEG 설정이 있으면 pow 대신 원시 eeg 로 대역 파워를 계산
+        eeg = self.config.get("EEG", None)
+        streams = ["eeg" if eeg else "pow", "met"]
+        for headset, session in sessions.items():
+            api.register_listener(
+                self.power_listener(functools.partial(self.callbacks.pow_handler, headset=headset), features, eeg),
+                session)
+            api.register_listener(
+                self.listeners.MetricListener(functools.partial(self.callbacks.met_handler, headset=headset)), session)
+
+        await asyncio.gather(*[api.subscribe(token, session, streams) for session in sessions.values()])
+        await asyncio.sleep(600)
+        await asyncio.gather(*[api.unsubscribe(token, session, streams) for session in sessions.values()])
+
+    def reload_rules(self, path, old, new):
+        try:
+            self.callbacks.setup(new, self.actuator)
+            logger.info(f"{path} reloaded")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"{path} is invalid, keeping the previous rules: {e}")
+
+    def retarget_actuator(self, path, old, new):
+        client = self.actuator.client if self.actuator is not None else None
+        if new and hasattr(client, "retarget"):
+            client.retarget(new)
+            logger.info(f"actuator moved to {new}")
+
+    @staticmethod
+    def restart_required(path, old, new):
+        logger.warning(f"{path} changed, restart to apply it")
+
+    def run(self):
+        self.scheduler = self.scheduler_factory(event_loop=self.api.loop)
+        self.scheduler.start()
+        self.scheduler.add_job(self.weather_job, "interval", minutes=5)
+        # 설정 파일이 바뀌면 규칙과 액추에이터 주소는 실행 중에 반영, 리스너 구성은 재시작 필요
+        self.config.subscribe("Raspberry.Server_URL", self.retarget_actuator)
+        for path in ("Features", "EEG", "Actuator", "Emotiv"):
+            self.config.subscribe(path, self.restart_required)
+        watcher = self.api.loop.create_task(self.config.watch())
+        try:
+            return self.api.run()
+        finally:
+            watcher.cancel()
+            self.scheduler.shutdown(wait=False)
+            if self.actuator is not None:
+                self.api.loop.run_until_complete(self.close_actuator())
+
+    async def close_actuator(self):
+        await self.actuator.close()
+        await self.actuator.client.close()
+
+
+def create_app(config_file: str = None, profiler: StartupProfiler = None):
+    profiler = profiler if profiler else StartupProfiler()
+
+    with profiler.phase("import config"):
+        from .global_variable import Config, Metrics
+        from .utils.config import YAMLConfiguration
+
+    with profiler.phase("load config"):
+        if config_file:
+            Config.config = YAMLConfiguration(config_file)
+        config = Config.config
+        client_id = config.get("Emotiv.Client_ID")
+        client_secret = config.get("Emotiv.Client_Secret")
+
+    with profiler.phase("import cortex"):
+        import cortex
+
+    with profiler.phase("import listeners"):
+        from . import callbacks, listeners
+
+    with profiler.phase("import weather"):
+        from . import weather
+
+    with profiler.phase("import actuator"):
+        from . import actuator
+
+    with profiler.phase("import apscheduler"):
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    with profiler.phase("create app"):
+        app = None
+
+        async def main():
+            await app.main()
+
+        # 재시작해도 authorize 를 다시 하지 않도록 토큰을 설정 파일 옆에 보관
+        token_file = config.get("Emotiv.Token_File", None)
+        if token_file is None:
+            token_file = os.path.join(os.path.dirname(os.path.abspath(config.file)), TOKEN_FILE)
+        api = cortex.Wrapper(client_id=client_id, client_secret=client_secret,
+                             url=config.get("Emotiv.URL", DEFAULT_URL), main=main, token_file=token_file)
+        api.register_listener(listeners.GapListener(callbacks.reset))
+        weather_provider = weather.WeatherProvider(cache_file=config.get("Weather.Cache_File", None))
+        # 액추에이터 명령은 코얼레서를 거쳐 Actuator.Backend 로 전송, 설정이 없으면 사용하지 않음
+        coalescer = None
+        backend = config.get("Actuator.Backend", None)
+        if backend:
+            coalescer = actuator.CommandCoalescer(actuator.create_client(config, backend), loop=api.loop)
+        app = App(config, api, weather_provider, AsyncIOScheduler, callbacks, listeners, Metrics, coalescer)
+
+    return app
@@ -0,0 +1,147 @@
+import abc
+
+import numpy as np
+
+# Emotiv pow 스트림과 같은 대역 (Hz, [시작, 끝))
+DEFAULT_BANDS = {
+    "theta": (4, 8),
+    "alpha": (8, 12),
+    "betaL": (12, 16),
+    "betaH": (16, 25),
+    "gamma": (25, 45)
+}
+
+# eeg 스트림에서 전극이 아닌 열, MARKERS 는 리스트
+NON_CHANNELS = frozenset(("COUNTER", "INTERPOLATED", "RAW_CQ", "MARKER_HARDWARE", "MARKERS"))
+
+WELCH = "welch"
+SDFT = "sdft"
+
+
+def eeg_channels(cols):
+    return [col for col in cols if col not in NON_CHANNELS]
+
+
+def periodic_hann(n: int):
+    return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n) / n)
+
+
+def band_matrix(bands: dict, freqs):
+    # (대역, 주파수) 평균 행렬, 대역 안의 bin 들의 평균 파워를 구함
+    matrix = np.zeros((len(bands), len(freqs)))
+    for i, (name, (low, high)) in enumerate(bands.items()):
+        selected = (freqs >= low) & (freqs < high)
+        if not selected.any():
+            raise ValueError(f"band {name} ({low}-{high} Hz) has no frequency bin, use a longer window")
+        matrix[i, selected] = 1 / selected.sum()
+    return matrix
+
+
+class BandPower(abc.ABC):
+    # 샘플을 하나씩 push 하면 hop 샘플마다 "<채널>/<대역>" 순서의 대역 파워를 반환
+    def __init__(self, channels, rate: float = 128, bands: dict = None, window: int = 256, hop: int = 16):
+        self.channels = list(channels)
+        self.rate = rate
+        self.bands = dict(bands) if bands else dict(DEFAULT_BANDS)
+        self.window = window
+        self.hop = hop
+        self.count = 0
+        self.cols = [f"{channel}/{band}" for channel in self.channels for band in self.bands]
+
+    @abc.abstractmethod
+    def push(self, values):
+        pass
+
+    def reset(self):
+        self.count = 0
+
+    def _ready(self):
+        self.count += 1
+        return self.count >= self.window and (self.count - self.window) % self.hop == 0
+
+
+class WelchBandPower(BandPower):
+    # 최근 window 샘플을 segment 길이, overlap 비율로 겹쳐 나눈 뒤 Hann 창 FFT 파워를 평균
+    def __init__(self, channels, rate: float = 128, bands: dict = None, window: int = 256, hop: int = 16,
+                 segment: int = 128, overlap: float = 0.5):
+        super().__init__(channels, rate, bands, window, hop)
+        self.segment = min(segment, window)
+        self.step = max(1, int(self.segment * (1 - overlap)))
+        self.taper = periodic_hann(self.segment)
+        # 단측 스펙트럼 밀도 (uV^2/Hz)
+        self.scale = 2 / (rate * (self.taper ** 2).sum())
+        self.matrix = band_matrix(self.bands, np.fft.rfftfreq(self.segment, 1 / rate)).T
+        # RingBuffer 와 같이 두 곳에 기록하여 최근 window 샘플이 항상 연속된 뷰가 되도록 함
+        self.data = np.zeros((window * 2, len(self.channels)))
+
+    def push(self, values):
+        pos = self.count % self.window
+        self.data[pos] = values
+        self.data[pos + self.window] = values
+        if not self._ready():
+            return None
+        end = pos + self.window + 1
+        return self.estimate(self.data[end - self.window:end])
+
+    def estimate(self, samples):
+        # samples: (window, 채널) -> (채널 * 대역)
+        segments = np.lib.stride_tricks.sliding_window_view(samples, self.segment, axis=0)[::self.step]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        spectrum = np.fft.rfft(segments * self.taper, axis=-1)
+        psd = (spectrum.real ** 2 + spectrum.imag ** 2).mean(axis=0) * self.scale
+        return (psd @ self.matrix).ravel()
+
+
+class SlidingDFTBandPower(BandPower):
+    # 대역에 필요한 bin 만 샘플마다 X_k <- (X_k - x_old + x_new) * e^(j2πk/N) 로 갱신
+    resync_interval = 4096
+
+    def __init__(self, channels, rate: float = 128, bands: dict = None, window: int = 256, hop: int = 16):
+        super().__init__(channels, rate, bands, window, hop)
+        freqs = np.fft.rfftfreq(window, 1 / rate)
+        matrix = band_matrix(self.bands, freqs)
+        used = np.flatnonzero(matrix.any(axis=0))
+        if used[0] == 0 or used[-1] == len(freqs) - 1:
+            raise ValueError("sliding DFT bands must lie strictly between 0 Hz and the Nyquist frequency")
+        # Hann 창은 주파수 영역에서 이웃 bin 과의 합성곱이므로 양쪽으로 한 bin 씩 더 추적
+        self.bins = np.arange(used[0] - 1, used[-1] + 2)
+        inner = self.bins[1:-1]
+        self.matrix = matrix[:, inner].T
+        self.twiddle = np.exp(2j * np.pi * self.bins / window)[:, None]
+        self.scale = 2 / (rate * window * 3 / 8)
+        self.history = np.zeros((window, len(self.channels)))
+        self.spectrum = np.zeros((len(self.bins), len(self.channels)), dtype=np.complex128)
+
+    def reset(self):
+        super().reset()
+        self.history[:] = 0
+        self.spectrum[:] = 0
+
+    def push(self, values):
+        pos = self.count % self.window
+        values = np.asarray(values, dtype=np.float64)
+        spectrum = self.spectrum
+        spectrum += values - self.history[pos]
+        spectrum *= self.twiddle
+        self.history[pos] = values
+
+        if (self.count + 1) % self.resync_interval == 0:
+            # 회전 인자의 반올림 오차가 누적되지 않도록 주기적으로 다시 계산
+            ordered = np.roll(self.history, -(pos + 1), axis=0)
+            spectrum[:] = np.fft.rfft(ordered, axis=0)[self.bins]
+
+        if not self._ready():
+            return None
+        windowed = 0.5 * spectrum[1:-1] - 0.25 * (spectrum[:-2] + spectrum[2:])
+        psd = (windowed.real ** 2 + windowed.imag ** 2) * self.scale
+        return (psd.T @ self.matrix).ravel()
+
+
+def create(method: str, channels, **kwargs):
+    if method == WELCH:
+        return WelchBandPower(channels, **kwargs)
+    elif method == SDFT:
+        kwargs.pop("segment", None)
+        kwargs.pop("overlap", None)
+        return SlidingDFTBandPower(channels, **kwargs)
+    raise ValueError(f"unknown band power method: {method}")
@@ -1,47 +1,157 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
 import yaml
 
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class ConfigurationError(KeyError):
+    pass
+
 
 class YAMLConfiguration:
     file = None
     __config = None
 
-    def __init__(self, file):
+    def __init__(self, file, check_interval: float = 1.0):
         self.file = file
-        self.__config = dict()
+        self.check_interval = check_interval
+        self.__config = None
+        self.__cache = dict()
+        self.__subscribers = dict()
+        self.__stamp = None
+        self.__checked = 0.0
+        self.__lock = threading.RLock()
+
+    def __file_stamp(self):
+        try:
+            stat = os.stat(self.file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
 
     def load(self):
+        stamp = self.__file_stamp()
         with open(self.file, 'r', encoding='utf-8') as f:
 
             try:
-                self.__config = yaml.safe_load(f)
-                return True
+                config = yaml.safe_load(f)
 
             except yaml.YAMLError as err:
+                # 파일이 다시 바뀔 때까지 재시도하지 않음
+                self.__stamp = stamp
+                self.__checked = time.monotonic()
+                logger.warning(f"{self.file} could not be parsed, keeping previous configuration: {err}")
                 return err
 
+        # 파싱이 끝난 뒤 참조만 교체하여 읽는 쪽에서 반쯤 바뀐 설정을 보지 않도록 함
+        with self.__lock:
+            old = self.__config
+            self.__config = config if isinstance(config, dict) else dict()
+            self.__cache = dict()
+            self.__stamp = stamp
+            self.__checked = time.monotonic()
+
+        if old is not None:
+            self.__notify(old)
+        return True
+
+    def reload_if_changed(self):
+        self.__checked = time.monotonic()
+        stamp = self.__file_stamp()
+        if stamp is not None and stamp != self.__stamp:
+            logger.info(f"{self.file} changed, reloading")
+            return self.load()
+        return False
+
+    def __ensure_loaded(self):
+        if self.__config is None:
+            with self.__lock:
+                if self.__config is None:
+                    self.load()
+        elif self.check_interval is not None and time.monotonic() - self.__checked >= self.check_interval:
+            self.reload_if_changed()
+
+    async def watch(self, interval: float = None):
+        while True:
+            await asyncio.sleep(interval if interval else self.check_interval)
+            try:
+                self.reload_if_changed()
+            except OSError as e:
+                logger.warning(f"{self.file} could not be reloaded: {e!r}")
+
     def save(self):
+        self.__ensure_loaded()
         with open(self.file, 'w', encoding='utf-8') as f:
             yaml.safe_dump(self.__config, stream=f, default_flow_style=False, allow_unicode=True)
+        self.__stamp = self.__file_stamp()
 
-    def get(self, path):
-        paths = path.split(".")
-        res = self.__config
+    @staticmethod
+    def __resolve(config, path):
+        res = config
+        for x in path.split("."):
+            if not isinstance(res, dict) or x not in res:
+                return _MISSING
+            res = res[x]
+        return res
 
-        for x in paths:
-            if x not in res:
-                return False
-            else:
-                res = res[x]
+    def get(self, path, default=_MISSING):
+        self.__ensure_loaded()
+        cache = self.__cache
+        res = cache.get(path, _MISSING)
+        if res is _MISSING and path not in cache:
+            res = cache[path] = self.__resolve(self.__config, path)
 
+        if res is _MISSING:
+            if default is _MISSING:
+                raise ConfigurationError(f"{path} is not set in {self.file}")
+            return default
         return res
 
     def set(self, path, value):
+        self.__ensure_loaded()
         paths = path.split(".")
-        d = self.__config
 
-        for x in range(0, len(paths) - 1):
-            if paths[x] not in d:
-                d[paths[x]] = dict()
-            d = d[paths[x]]
+        with self.__lock:
+            old = self.__config
+            self.__config = d = dict(old)
+
+            for x in range(0, len(paths) - 1):
+                child = d.get(paths[x])
+                d[paths[x]] = dict(child) if isinstance(child, dict) else dict()
+                d = d[paths[x]]
+
+            d[paths[-1]] = value
+            self.__cache = dict()
+
+        self.__notify(old)
+
+    def subscribe(self, path, callback):
+        # callback(path, old, new) 는 path 의 값이 바뀔 때 호출됨
+        self.__subscribers.setdefault(path, []).append(callback)
+
+    def unsubscribe(self, path, callback):
+        callbacks = self.__subscribers.get(path, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def __notify(self, old):
+        for path, callbacks in list(self.__subscribers.items()):
+            before = self.__resolve(old, path)
+            after = self.__resolve(self.__config, path)
+            if before == after:
+                continue
 
-        d[paths[-1]] = value
+            before = None if before is _MISSING else before
+            after = None if after is _MISSING else after
+            for callback in list(callbacks):
+                try:
+                    callback(path, before, after)
+                except Exception:
+                    logger.exception(f"config subscriber for {path} failed")
@@ -0,0 +1,94 @@
+import math
+
+
+class RollingWindow:
+    __slots__ = ("length", "values", "pos", "count", "mean", "__m2", "__updates")
+
+    # 슬라이딩 Welford 갱신의 부동소수점 오차 누적을 막기 위해 주기적으로 다시 계산
+    resync_interval = 4096
+
+    def __init__(self, length: int = 10):
+        self.length = length
+        self.values = [0.0] * length
+        self.reset()
+
+    def reset(self):
+        self.pos = 0
+        self.count = 0
+        self.mean = 0.0
+        self.__m2 = 0.0
+        self.__updates = 0
+
+    def push(self, value: float):
+        if self.count < self.length:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.__m2 += delta * (value - self.mean)
+        else:
+            old = self.values[self.pos]
+            mean = self.mean + (value - old) / self.length
+            self.__m2 += (value - old) * (value - mean + old - self.mean)
+            self.mean = mean
+
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % self.length
+
+        self.__updates += 1
+        if self.__updates >= self.resync_interval:
+            self.__resync()
+        return self.mean
+
+    def __resync(self):
+        values = self.values if self.count == self.length else self.values[:self.count]
+        self.mean = math.fsum(values) / self.count
+        self.__m2 = math.fsum((v - self.mean) ** 2 for v in values)
+        self.__updates = 0
+
+    @property
+    def full(self):
+        return self.count == self.length
+
+    @property
+    def variance(self):
+        return max(self.__m2, 0.0) / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class RollingCount:
+    __slots__ = ("length", "flags", "pos", "size", "count")
+
+    def __init__(self, length: int = 10):
+        self.length = length
+        self.flags = bytearray(length)
+        self.reset()
+
+    def reset(self):
+        self.flags[:] = bytes(self.length)
+        self.pos = 0
+        self.size = 0
+        self.count = 0
+
+    def push(self, flag: bool):
+        flag = 1 if flag else 0
+        if self.size < self.length:
+            self.size += 1
+        else:
+            self.count -= self.flags[self.pos]
+
+        self.flags[self.pos] = flag
+        self.count += flag
+        self.pos = (self.pos + 1) % self.length
+        return self.count
+
+    @property
+    def full(self):
+        return self.size == self.length
+
+    @property
+    def ratio(self):
+        return self.count / self.size if self.size else 0.0
+
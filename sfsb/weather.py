@@ -1,14 +1,116 @@
+import asyncio
 import json
+import logging
+import os
+import time
 
-import requests
+from .global_variable import Config
 
-from global_variable import Config
+logger = logging.getLogger(__name__)
 
-api_key = Config.config.get("Weather.Api_Key")
+WEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
 
 
-def get_weather(city: str):
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}"
-    req = requests.get(url)
-    data = json.loads(req.text)
-    return data
\ No newline at end of file
+class WeatherEntry:
+    __slots__ = ("data", "fetched_at")
+
+    def __init__(self, data: dict, fetched_at: float):
+        self.data = data
+        self.fetched_at = fetched_at
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+
+class WeatherProvider:
+    def __init__(self, key: str = None, ttl: float = 300, cache_file: str = None, url: str = WEATHER_URL,
+                 timeout: float = 5):
+        self.key = key
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self.url = url
+        self.timeout = timeout
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.__cache = dict()
+        self.__refreshing = dict()
+        self.__load()
+
+    def __load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                for city, entry in json.load(f).items():
+                    self.__cache[city] = WeatherEntry(entry["data"], entry["fetched_at"])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"weather cache {self.cache_file} ignored: {e!r}")
+
+    def __save(self):
+        if not self.cache_file:
+            return
+        tmp = f"{self.cache_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({city: {"data": e.data, "fetched_at": e.fetched_at} for (city, e) in self.__cache.items()}, f)
+        os.replace(tmp, self.cache_file)
+
+    def entry(self, city: str):
+        return self.__cache.get(city)
+
+    async def get(self, city: str):
+        entry = self.__cache.get(city)
+        if entry is not None:
+            if entry.age < self.ttl:
+                self.hits += 1
+            else:
+                # 만료된 값을 바로 돌려주고 갱신은 백그라운드에서 한번만 수행
+                self.stale_hits += 1
+                self.refresh(city)
+            return entry.data
+
+        self.misses += 1
+        return (await self.refresh(city)).data
+
+    def refresh(self, city: str):
+        task = self.__refreshing.get(city)
+        if task is None:
+            task = self.__refreshing[city] = asyncio.ensure_future(self.__fetch(city))
+            task.add_done_callback(lambda t: self.__refreshing.pop(city, None))
+        return task
+
+    async def __fetch(self, city: str):
+        # aiohttp 는 처음 갱신할 때 불러옴
+        import aiohttp
+
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+                key = self.key if self.key else Config.config.get("Weather.Api_Key")
+                async with session.get(self.url, params={"q": city, "appid": key}) as res:
+                    res.raise_for_status()
+                    data = await res.json(content_type=None)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"weather refresh for {city} failed: {e!r}")
+            entry = self.__cache.get(city)
+            if entry is None:
+                raise
+            return entry
+
+        entry = self.__cache[city] = WeatherEntry(data, time.time())
+        try:
+            self.__save()
+        except OSError as e:
+            logger.warning(f"weather cache {self.cache_file} not saved: {e!r}")
+        return entry
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "refreshing": len(self.__refreshing)
+        }